@@ -0,0 +1,348 @@
+# Staged asyncio pipeline: fetch -> score -> aggregate -> render -> persist
+import asyncio
+import json
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from tweet_store import write_csv_results
+from word_frequencies import WordFrequencyTable
+
+STAGES = ('fetch', 'score', 'aggregate', 'render', 'persist')
+# Handles waiting between two stages; a full queue blocks the stage before it (backpressure).
+DEFAULT_QUEUE_SIZE = 2
+
+# Marks the end of a queue; one is sent per worker of the next stage.
+_DONE = object()
+# Handles stored but not yet persisted; their derived data is rebuilt on the next run.
+PENDING_FILENAME = 'pending_handles.json'
+
+
+
+class PipelineError(Exception):
+    """
+    Raised by 'AsyncTweetPipeline.run' (with 'raise_on_error') when a stage failed for any handle.
+    'stats' holds the statistics of the run, with the failed handles under 'failed'.
+    """
+    def __init__(self, stats):
+        self.stats = stats
+        super().__init__("Pipeline failed for {} handle(s): {}".format(len(stats['failed']), ', '.join(
+            "@{} ({})".format(username, error) for username, error in stats['failed'].items())))
+
+
+
+class AsyncTweetPipeline():
+    """
+    Runs the per-handle flow of 'tweet_analysis.py' as concurrent stages connected by bounded queues,
+    so fetching, scoring, database work, chart rendering and file writes of different handles overlap.
+    Blocking work runs on executors, the event loop only moves handles between stages:
+        - fetch: timeline paging, on 'fetch' threads (rate limited by the 'TimelineFetchScheduler').
+        - score: 'tweets_to_data_frame', on one thread ('TweetAnalyzer' fans out to its own processes).
+        - aggregate: store merge, sentiment rollups, mention counts (and graph) and word frequencies, on one database thread.
+        - render: charts and word clouds, on the processes of 'ChartRenderer' (or one thread).
+        - persist: word frequency tables and CSV results, on one thread.
+
+    Each stage handles one handle at a time, except fetch (one per fetch worker) and render (one per render process);
+    'concurrency' overrides that per stage. A handle whose stage fails is dropped from the run and listed under
+    'failed' in the returned statistics.
+
+    The store is updated in the aggregate stage, before the charts and files derived from it exist.
+    A handle is recorded as pending in 'results_path/pending_handles.json' from then until it is persisted, so
+    if a later stage (or the run) fails, the next run rebuilds its rollups, mention graph, word frequencies,
+    charts and CSV files from every stored tweet, even when no new tweets are fetched.
+    """
+    def __init__(self, tweet_analyzer, fetch_scheduler, tweet_store, rollup_index, chart_renderer, results_path,
+                 number_of_tweets, incremental_sync=True, write_csv=False, include_all_csv=True,
+                 rollup_chart_granularity=None, queue_size=DEFAULT_QUEUE_SIZE, concurrency=None, instrumentation=None,
+                 mention_graph=None):
+        """
+        Parameters:
+            - tweet_analyzer (TweetAnalyzer)
+            - fetch_scheduler (TimelineFetchScheduler)
+            - tweet_store (TweetStore or SQLiteTweetStore)
+            - rollup_index (SentimentRollupIndex)
+            - chart_renderer (ChartRenderer): Its 'max_workers' sets the number of render processes.
+            - results_path (string)
+            - number_of_tweets (int): Maximum number of tweets fetched per handle.
+            - incremental_sync (bool): Merge the fetched tweets into the store instead of replacing them.
+            - write_csv (bool): Write the per-user CSV results.
+            - include_all_csv (bool): Also write the 'all' CSV file (the CSV store already does).
+            - rollup_chart_granularity (string): Also plot the rollups at this granularity (None disables).
+            - queue_size (int): Capacity of each queue between two stages.
+            - concurrency (dict): Optional stage name -> number of handles processed at the same time.
+            - instrumentation (RunInstrumentation): Records every stage run per handle (None disables).
+            - mention_graph (MentionGraphIndex): Cross-user mention graph to add the stored tweets to (None disables).
+        """
+        self.tweet_analyzer = tweet_analyzer
+        self.fetch_scheduler = fetch_scheduler
+        self.tweet_store = tweet_store
+        self.rollup_index = rollup_index
+        self.chart_renderer = chart_renderer
+        self.results_path = results_path
+        self.number_of_tweets = number_of_tweets
+        self.incremental_sync = incremental_sync
+        self.write_csv = write_csv
+        self.include_all_csv = include_all_csv
+        self.rollup_chart_granularity = rollup_chart_granularity
+        self.queue_size = queue_size
+        self.instrumentation = instrumentation
+        self.mention_graph = mention_graph
+        # 'score' and 'aggregate' use a single thread: the analyzer and the SQLite connections are not thread-safe.
+        self.concurrency = {
+            'fetch': fetch_scheduler.max_workers,
+            'score': 1,
+            'aggregate': 1,
+            'render': max(1, chart_renderer.max_workers),
+            'persist': 1
+        }
+        self.concurrency.update(concurrency or dict())
+        self.processed = Counter()
+        self.errors = list()
+        self.tweets_persisted = 0
+        self._executors = dict()
+        self.pending_filename = os.path.join(results_path, PENDING_FILENAME)
+        self._pending = set()
+        if os.path.exists(self.pending_filename):
+            with open(self.pending_filename, 'r') as pending_file:
+                self._pending = set(json.load(pending_file))
+        # The pending set is updated from the aggregate and persist threads.
+        self._pending_lock = threading.Lock()
+
+
+    def run(self, usernames, since_ids=None, raise_on_error=False):
+        """
+        Definition:
+            Runs every handle through the pipeline and waits for all of them to be persisted.
+
+        Parameters:
+            - usernames (list of strings)
+            - since_ids (dict): Optional username -> since_id (see 'TimelineFetchScheduler.fetch_user_timeline').
+            - raise_on_error (bool): Raise 'PipelineError' if a stage failed for any handle, instead of
+              only listing the handle under 'failed'.
+
+        Returns:
+            - Dictionary of pipeline statistics (see 'stats').
+
+        """
+        asyncio.run(self.run_async(usernames, since_ids))
+        stats = self.stats()
+        if raise_on_error and stats['failed']:
+            raise PipelineError(stats)
+        return stats
+
+
+    async def run_async(self, usernames, since_ids=None):
+        since_ids = since_ids or dict()
+        self._executors = {
+            'fetch': ThreadPoolExecutor(max_workers=self.concurrency['fetch']),
+            'score': ThreadPoolExecutor(max_workers=1),
+            'aggregate': ThreadPoolExecutor(max_workers=1),
+            # pyplot is not thread-safe: several renders at once need processes.
+            'render': ProcessPoolExecutor(max_workers=self.concurrency['render']) if self.concurrency['render'] > 1
+                      else ThreadPoolExecutor(max_workers=1),
+            'persist': ThreadPoolExecutor(max_workers=self.concurrency['persist'])
+        }
+        # The usernames queue is unbounded (it only holds strings), every other queue is bounded.
+        queues = [asyncio.Queue()] + [asyncio.Queue(maxsize=self.queue_size) for _ in STAGES[1:]]
+        for username in usernames:
+            queues[0].put_nowait({'username': username, 'since_id': since_ids.get(username)})
+        for _ in range(self.concurrency['fetch']):
+            queues[0].put_nowait(_DONE)
+
+        handlers = {
+            'fetch': self._fetch,
+            'score': self._score,
+            'aggregate': self._aggregate,
+            'render': self._render,
+            'persist': self._persist
+        }
+        stages = list()
+        for i, name in enumerate(STAGES):
+            out_queue = queues[i + 1] if i + 1 < len(STAGES) else None
+            next_workers = self.concurrency[STAGES[i + 1]] if out_queue is not None else 0
+            stages.append(self._run_stage(name, handlers[name], queues[i], out_queue, next_workers))
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            for executor in self._executors.values():
+                executor.shutdown(wait=True)
+            self._executors = dict()
+
+
+    def _set_pending(self, username, pending):
+        with self._pending_lock:
+            if pending:
+                self._pending.add(username)
+            else:
+                self._pending.discard(username)
+            temporary_filename = self.pending_filename + '.tmp'
+            with open(temporary_filename, 'w') as pending_file:
+                json.dump(sorted(self._pending), pending_file, indent=4)
+            os.replace(temporary_filename, self.pending_filename)
+
+
+    async def _run_stage(self, name, handler, in_queue, out_queue, next_workers):
+        async def worker():
+            while True:
+                item = await in_queue.get()
+                if item is _DONE:
+                    return
+                try:
+                    item = await handler(item)
+                except Exception as e:
+                    self.errors.append((name, item['username'], e))
+                    print("\nERROR ({}) - Stage '{}' failed - Handle: @{}".format(e, name, item['username']))
+                    continue
+                if item is None:
+                    continue
+                self.processed[name] += 1
+                if out_queue is not None:
+                    # Waits while the next stage is busy, which in turn stalls this stage's input.
+                    await out_queue.put(item)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency[name])))
+        if out_queue is not None:
+            for _ in range(next_workers):
+                await out_queue.put(_DONE)
+
+
+    async def _run_in_executor(self, stage, username, function, *args, count_items=None):
+        executor = self._executors[stage]
+        loop = asyncio.get_running_loop()
+        if self.instrumentation is None:
+            return await loop.run_in_executor(executor, function, *args)
+        if isinstance(executor, ThreadPoolExecutor):
+            function = self.instrumentation.wrap(stage, username, function, count_items)
+            return await loop.run_in_executor(executor, function, *args)
+        # Work done in another process: only the wall time seen from here is recorded.
+        with self.instrumentation.stage(stage, username, measure_cpu=False) as record:
+            result = await loop.run_in_executor(executor, function, *args)
+            if count_items is not None:
+                record['items'] = count_items(result)
+            return result
+
+
+    async def _fetch(self, item):
+        try:
+            tweets = await self._run_in_executor('fetch', item['username'], self.fetch_scheduler.fetch_user_timeline,
+                                                 item['username'], self.number_of_tweets, item['since_id'], count_items=len)
+        except Exception as e:
+            self.errors.append(('fetch', item['username'], e))
+            print("\nERROR ({}) - Either username is wrong OR page not found - Handle: @{}".format(e, item['username']))
+            return None
+        item['tweets'] = tweets
+        return item
+
+
+    async def _score(self, item):
+        tweets = item.pop('tweets')
+        item['tweets_fetched'] = len(tweets)
+        # Only the DataFrame moves on, so the 'Status' objects can be freed.
+        item['df'] = await self._run_in_executor('score', item['username'], self.tweet_analyzer.tweets_to_data_frame,
+                                                 tweets, count_items=len)
+        return item
+
+
+    async def _aggregate(self, item):
+        return await self._run_in_executor('aggregate', item['username'], self.aggregate, item,
+                                           count_items=lambda item: len(item['df']) if item is not None else 0)
+
+
+    def aggregate(self, item):
+        """
+        Stores the scored tweets of one handle and derives everything the later stages need from them.
+        Returns None (dropping the handle) if an incremental sync found no new tweets.
+        """
+        username = item['username']
+        tweet_analyzer = self.tweet_analyzer
+        # A handle left pending by an earlier run has stored tweets its derived data may be missing.
+        rebuild = username in self._pending or not self.incremental_sync
+        self._set_pending(username, True)
+        if self.incremental_sync:
+            df, df_added = self.tweet_store.merge(username, item['df'])
+            if df_added.empty and not rebuild:
+                self._set_pending(username, False)
+                print("\nUsername: {}\nNo new tweets since last sync".format(username))
+                return None
+            if rebuild or not self.rollup_index.has_handle(username):
+                self.rollup_index.rebuild(username, df)
+            else:
+                self.rollup_index.update(username, df_added)
+            if self.mention_graph is not None:
+                if rebuild or not self.mention_graph.has_handle(username):
+                    self.mention_graph.rebuild(username, df)
+                else:
+                    self.mention_graph.update(username, df_added)
+        else:
+            df = df_added = item['df']
+            self.tweet_store.replace(username, df)
+            self.rollup_index.rebuild(username, df)
+            if self.mention_graph is not None:
+                self.mention_graph.rebuild(username, df)
+        item['df'] = df
+        item['df_tweets_original'] = tweet_analyzer.get_original_tweets(df)
+        item['df_mentions'] = tweet_analyzer.get_mention_stats(df)
+
+        # Word counts are kept per user, so an incremental sync only tokenizes the newly added tweets.
+        word_frequencies_filename = "{}/{} - Word frequencies.json".format(self.results_path, username)
+        word_frequencies = None
+        if not rebuild and os.path.exists(word_frequencies_filename):
+            # None for a table saved without bigrams, which is counted again below.
+            word_frequencies = WordFrequencyTable.load(word_frequencies_filename)
+        if word_frequencies is not None:
+            word_frequencies.merge(tweet_analyzer.count_words(tweet_analyzer.get_original_tweets(df_added)))
+        else:
+            word_frequencies = tweet_analyzer.count_words(item['df_tweets_original'])
+        item['word_frequencies'] = word_frequencies
+        item['word_frequencies_filename'] = word_frequencies_filename
+
+        if self.rollup_chart_granularity is not None:
+            item['df_rollup'] = self.rollup_index.query(username, granularity=self.rollup_chart_granularity)
+        return item
+
+
+    async def _render(self, item):
+        username = item['username']
+        jobs = [
+            self.chart_renderer.sentiment_charts_job(username, item['df'], self.results_path),
+            self.chart_renderer.wordcloud_job(username, item['word_frequencies'], self.results_path)
+        ]
+        if 'df_rollup' in item:
+            jobs.append(self.chart_renderer.rollup_charts_job(username, item.pop('df_rollup'), self.results_path,
+                                                              self.rollup_chart_granularity))
+        # Items of the render stage are charts.
+        await asyncio.gather(*(self._run_in_executor('render', username, function, *args, count_items=lambda _: 1)
+                               for function, args in jobs))
+        return item
+
+
+    async def _persist(self, item):
+        item = await self._run_in_executor('persist', item['username'], self.persist, item)
+        self.tweets_persisted += len(item['df'])
+        return item
+
+
+    def persist(self, item):
+        username, df, df_tweets_original = item['username'], item['df'], item['df_tweets_original']
+        item['word_frequencies'].save(item['word_frequencies_filename'])
+        if self.write_csv:
+            write_csv_results(self.results_path, username, df, df_tweets_original, item['df_mentions'],
+                              include_all=self.include_all_csv)
+        self._set_pending(username, False)
+        print("\nUsername: {}\nTweets requested: {}\nTweets extracted: {}\nTweets stored: {}\nOriginal tweets: {}".\
+            format(username, self.number_of_tweets, item['tweets_fetched'], len(df), len(df_tweets_original)))
+        return item
+
+
+    def stats(self):
+        return {
+            'processed': {name: self.processed[name] for name in STAGES},
+            'errors': len(self.errors),
+            # Handle -> "stage: exception type" of the handles dropped by a failing stage (the errors are printed).
+            'failed': {username: "{}: {}".format(stage, type(error).__name__) for stage, username, error in self.errors},
+            'tweets_persisted': self.tweets_persisted,
+            # Handles whose derived data is rebuilt on the next run.
+            'pending': sorted(self._pending),
+            'concurrency': dict(self.concurrency),
+            'queue_size': self.queue_size
+        }
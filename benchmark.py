@@ -0,0 +1,273 @@
+# Offline benchmarks: synthetic tweets and a replay API instead of Twitter (no credentials needed)
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import OrderedDict
+import pandas as pd
+
+import text_processing
+import tweet_analysis
+from async_pipeline import AsyncTweetPipeline
+from chart_rendering import ChartRenderer
+from fake_twitter_api import FakeTwitterAPI
+from fetch_scheduler import TimelineFetchScheduler
+from sentiment_cache import SentimentCache
+from sentiment_rollups import SentimentRollupIndex
+from synthetic_tweets import SyntheticTweetGenerator
+from tweet_store import SQLiteTweetStore
+
+DEFAULT_SCALES = [1000, 10000, 100000]
+BENCHMARKS_PATH = "./benchmarks"
+# Handles the synthetic tweets are spread over in the end-to-end benchmark.
+END_TO_END_HANDLES = 10
+
+
+
+def timed(function, *args):
+    """
+    Returns tuple (seconds, result) of a single call of 'function(*args)'.
+    """
+    started_at = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started_at, result
+
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                             stderr=subprocess.DEVNULL).strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+
+# Benchmarks: each takes (context, scale) and returns tuple (timed seconds, number of tweets processed).
+# 'context' holds the generator, a scratch folder and the command line options.
+def bench_clean_tweet(context, scale):
+    texts = context['generator'].texts(scale)
+    return timed(lambda: [text_processing.clean_tweet(text) for text in texts])[0], scale
+
+
+def bench_clean_tweets(context, scale):
+    texts = pd.Series(context['generator'].texts(scale), dtype=object)
+    return timed(text_processing.clean_tweets, texts)[0], scale
+
+
+def bench_sentiment(context, scale):
+    """
+    Cold scoring: in-process memo cleared, no persistent cache.
+    """
+    texts = context['generator'].texts(scale)
+    tweet_analysis.score_cleaned_text.cache_clear()
+    tweet_analyzer = tweet_analysis.TweetAnalyzer(n_workers=context['options'].sentiment_workers)
+    try:
+        return timed(tweet_analyzer.analyze_sentiment_batch, texts)[0], scale
+    finally:
+        tweet_analyzer.close()
+
+
+def bench_sentiment_cached(context, scale):
+    """
+    Warm scoring: every text already in the persistent 'SentimentCache' (Eg: a re-run over stored tweets).
+    """
+    texts = context['generator'].texts(scale)
+    sentiment_cache = SentimentCache(os.path.join(context['work_path'], 'sentiment_cache.sqlite'), 'benchmark')
+    tweet_analyzer = tweet_analysis.TweetAnalyzer(sentiment_cache=sentiment_cache, n_workers=context['options'].sentiment_workers)
+    try:
+        tweet_analyzer.analyze_sentiment_batch(texts)
+        tweet_analysis.score_cleaned_text.cache_clear()
+        return timed(tweet_analyzer.analyze_sentiment_batch, texts)[0], scale
+    finally:
+        tweet_analyzer.close()
+        sentiment_cache.close()
+
+
+def bench_mention_stats(context, scale):
+    df = pd.DataFrame({'tweets': context['generator'].texts(scale)})
+    return timed(tweet_analysis.TweetAnalyzer().get_mention_stats, df)[0], scale
+
+
+def bench_create_df_from_json(context, scale):
+    json_filename = os.path.join(context['work_path'], 'tweets_{}.json'.format(scale))
+    context['generator'].write_jsonl(json_filename, scale)
+    return timed(tweet_analysis.TweetAnalyzer().create_df_from_json, json_filename)[0], scale
+
+
+def bench_create_wordcloud(context, scale):
+    df = pd.DataFrame({'tweets': context['generator'].texts(scale)})
+    return timed(tweet_analysis.TweetAnalyzer().create_wordcloud, 'benchmark', context['work_path'], df)[0], scale
+
+
+def run_end_to_end(context, api, usernames, number_of_tweets):
+    """
+    Runs 'AsyncTweetPipeline' against 'api', with fresh stores and caches in a scratch folder.
+    Returns tuple (timed seconds, number of tweets persisted); raises if any handle was not persisted.
+    """
+    options = context['options']
+    results_path = tempfile.mkdtemp(dir=context['work_path'])
+    tweet_analysis.score_cleaned_text.cache_clear()
+    sentiment_cache = SentimentCache(os.path.join(results_path, 'sentiment_cache.sqlite'), 'benchmark')
+    tweet_analyzer = tweet_analysis.TweetAnalyzer(sentiment_cache=sentiment_cache, n_workers=options.sentiment_workers)
+    tweet_store = SQLiteTweetStore(os.path.join(results_path, 'tweets.sqlite'))
+    rollup_index = SentimentRollupIndex(os.path.join(results_path, 'tweets.sqlite'))
+    chart_renderer = ChartRenderer(max_workers=options.render_workers)
+    pipeline = AsyncTweetPipeline(tweet_analyzer, TimelineFetchScheduler(api, max_workers=options.fetch_workers),
+                                  tweet_store, rollup_index, chart_renderer, results_path, number_of_tweets,
+                                  incremental_sync=False, write_csv=True)
+    try:
+        # The per-handle summaries are not part of what is measured.
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds, stats = timed(lambda: pipeline.run(usernames, raise_on_error=True))
+        # A run that did not persist every handle is not comparable with one that did.
+        if stats['processed']['persist'] < len(usernames):
+            raise RuntimeError("Only {} of {} handles were persisted".format(stats['processed']['persist'], len(usernames)))
+        return seconds, stats['tweets_persisted']
+    finally:
+        chart_renderer.close()
+        tweet_analyzer.close()
+        sentiment_cache.close()
+        rollup_index.close()
+        tweet_store.close()
+
+
+def bench_end_to_end(context, scale):
+    usernames = ['synthetic_{}'.format(i) for i in range(END_TO_END_HANDLES)]
+    tweets_per_user = max(1, scale // len(usernames))
+    api = FakeTwitterAPI(context['generator'].timelines(usernames, tweets_per_user), latency=context['options'].latency)
+    return run_end_to_end(context, api, usernames, tweets_per_user)
+
+
+def bench_end_to_end_replay(context, scale):
+    """
+    Same as 'bench_end_to_end', replaying the tweets stored in the results folder (whatever the scale).
+    """
+    api = FakeTwitterAPI.from_results_csv(context['options'].results_path, latency=context['options'].latency)
+    if not api.timelines:
+        raise ValueError("No stored tweets in '{}'".format(context['options'].results_path))
+    number_of_tweets = max(len(statuses) for statuses in api.timelines.values())
+    return run_end_to_end(context, api, list(api.timelines), number_of_tweets)
+
+
+BENCHMARKS = OrderedDict([
+    ('clean_tweet', bench_clean_tweet),
+    ('clean_tweets', bench_clean_tweets),
+    ('sentiment', bench_sentiment),
+    ('sentiment_cached', bench_sentiment_cached),
+    ('get_mention_stats', bench_mention_stats),
+    ('create_df_from_json', bench_create_df_from_json),
+    ('create_wordcloud', bench_create_wordcloud),
+    ('end_to_end', bench_end_to_end),
+    ('end_to_end_replay', bench_end_to_end_replay)
+])
+# Benchmarks whose input does not depend on the scale; they run once.
+FIXED_SCALE_BENCHMARKS = {'end_to_end_replay'}
+
+
+
+def run_benchmarks(names, scales, options):
+    """
+    Definition:
+        Runs each benchmark in 'names' at each scale, with the same synthetic tweets for a given seed.
+
+    Returns:
+        - List of dictionaries (one per run) with keys 'benchmark', 'scale' (None for fixed inputs),
+          'tweets' (processed), 'seconds', 'tweets_per_second' and 'error' (None unless the benchmark failed).
+
+    """
+    work_path = tempfile.mkdtemp(prefix='tweet_benchmark_')
+    results = list()
+    try:
+        for name in names:
+            for scale in (scales[:1] if name in FIXED_SCALE_BENCHMARKS else scales):
+                context = {'generator': SyntheticTweetGenerator(seed=options.seed), 'work_path': work_path, 'options': options}
+                try:
+                    (seconds, tweets), error = BENCHMARKS[name](context, scale), None
+                except Exception as e:
+                    seconds, tweets, error = None, None, "{}: {}".format(type(e).__name__, e)
+                if name in FIXED_SCALE_BENCHMARKS:
+                    scale = None
+                result = {
+                    'benchmark': name,
+                    'scale': scale,
+                    'tweets': tweets,
+                    'seconds': round(seconds, 4) if seconds is not None else None,
+                    'tweets_per_second': round(tweets / seconds, 1) if seconds and tweets else None,
+                    'error': error
+                }
+                results.append(result)
+                print("{:<22}{:>10}  {}".format(name, scale or '-', error or "{:.3f}s".format(seconds)))
+    finally:
+        shutil.rmtree(work_path, ignore_errors=True)
+    return results
+
+
+def compare_results(baseline, results):
+    """
+    Prints the speedup of 'results' over 'baseline' (both lists of result dictionaries) per benchmark and scale.
+    """
+    baseline_seconds = {(result['benchmark'], result['scale']): result['seconds'] for result in baseline}
+    print("\n{:<22}{:>10}{:>12}{:>12}{:>10}".format('benchmark', 'scale', 'baseline', 'current', 'speedup'))
+    for result in results:
+        before = baseline_seconds.get((result['benchmark'], result['scale']))
+        if before is None or result['seconds'] is None:
+            continue
+        print("{:<22}{:>10}{:>11.3f}s{:>11.3f}s{:>9.2f}x".format(result['benchmark'], result['scale'] or '-',
+              before, result['seconds'], before / result['seconds'] if result['seconds'] else float('inf')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the tweet analysis offline, on synthetic or stored tweets.")
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help="Benchmarks to run (default: all).")
+    parser.add_argument('--scales', nargs='+', type=int, default=DEFAULT_SCALES,
+                        help="Numbers of tweets to run each benchmark with (Eg: 1000 100000 1000000).")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sentiment-workers', type=int, default=1)
+    parser.add_argument('--fetch-workers', type=int, default=4)
+    parser.add_argument('--render-workers', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds each replayed API call takes.")
+    parser.add_argument('--results-path', default="./results", help="Folder of stored tweets for 'end_to_end_replay'.")
+    parser.add_argument('--output', help="JSON file to save results to (default: '{}/<commit>.json').".format(BENCHMARKS_PATH))
+    parser.add_argument('--compare', help="JSON file of earlier results to compare against.")
+    options = parser.parse_args()
+
+    commit, dirty = git_commit()
+    results = run_benchmarks(options.benchmarks, options.scales, options)
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'options': vars(options),
+        'results': results
+    }
+    output_filename = options.output
+    if output_filename is None:
+        os.makedirs(BENCHMARKS_PATH, exist_ok=True)
+        output_filename = os.path.join(BENCHMARKS_PATH, "{}{}.json".format(commit or 'benchmark', '-dirty' if dirty else ''))
+    with open(output_filename, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+    print("\nSaved results to '{}'".format(output_filename))
+
+    if options.compare:
+        with open(options.compare, 'r') as baseline_file:
+            compare_results(json.load(baseline_file)['results'], results)
+
+
+
+if __name__ == '__main__':
+    import warnings
+    warnings.filterwarnings("ignore")
+    main()
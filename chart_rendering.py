@@ -0,0 +1,193 @@
+# Headless chart rendering
+import matplotlib
+matplotlib.use('Agg')   # Non-interactive backend: no GUI event loop, safe in worker processes.
+import matplotlib.pyplot as plt
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from wordcloud import WordCloud
+
+# Series longer than this are downsampled before plotting.
+MAX_PLOT_POINTS = 1000
+
+ROLLUP_CHART_LABELS = {'hour': 'hourly', 'day': 'daily', 'week': 'weekly'}
+
+
+
+def downsample_series(dates, values, max_points=MAX_PLOT_POINTS):
+    """
+    Definition:
+        Reduces a series to at most 'max_points' points, keeping the minimum and maximum of
+        each bucket of consecutive points, so spikes stay visible.
+
+    Parameters:
+        - dates (array-like)
+        - values (array-like of floats)
+        - max_points (int)
+
+    Returns:
+        - Tuple of NumPy arrays (dates, values), in the original order.
+
+    """
+    dates = np.asarray(dates)
+    values = np.asarray(values, dtype=float)
+    if len(values) <= max_points:
+        return dates, values
+    bucket_edges = np.linspace(0, len(values), max_points // 2 + 1).astype(int)
+    keep = list()
+    for start, end in zip(bucket_edges[:-1], bucket_edges[1:]):
+        bucket = values[start:end]
+        keep.extend(sorted({start + int(np.argmin(bucket)), start + int(np.argmax(bucket))}))
+    keep = np.array(keep)
+    return dates[keep], values[keep]
+
+
+def render_sentiment_charts(username, polarity_dates, polarity, subjectivity_dates, subjectivity, results_path,
+                            chart_label=None):
+    """
+    Creates and saves the polarity and subjectivity plots of 'username'.
+    Plots are over a period of time (specified by the dates). Each series has its own dates,
+    since downsampling may keep different points of each. A 'chart_label' (Eg: 'daily average')
+    is added to the titles and filenames.
+    """
+    step_size = 0.25
+    label = " ({})".format(chart_label) if chart_label else ""
+
+    with plt.style.context('ggplot'):   # ['fivethirtyeight', 'seaborn-dark', 'seaborn-ticks', 'ggplot']
+        fig, ax = plt.subplots(figsize=(25, 14))
+        try:
+            ax.plot(polarity_dates, np.zeros(len(polarity)), linestyle='-.', linewidth=4, color='#696969', label='Neutral')
+            ax.plot(polarity_dates, polarity, linewidth=3, linestyle='-.', color='blue', label='Polarity slope')
+            ax.scatter(polarity_dates, polarity, marker='*', s=200, color='red', label='Data points')
+            ax.set_title("{} - Polarity scores over time{} (B/w -1 and +1)".format(username, label), fontsize=40)
+            ax.set_xlabel("Date", fontsize=30)
+            ax.set_ylabel("Polarity score", fontsize=30)
+            ax.tick_params(axis='x', labelsize=20, labelrotation=50)
+            ax.set_yticks(np.arange(-1, 1 + step_size, step=step_size))
+            ax.tick_params(axis='y', labelsize=20)
+            fig.tight_layout()
+            ax.grid()
+            ax.legend(loc='best', fontsize=24)
+            fig.savefig("{}/{} - Polarity scores over time{}.png".format(results_path, username, label))
+        finally:
+            plt.close(fig)
+
+        fig, ax = plt.subplots(figsize=(25, 14))
+        try:
+            ax.plot(subjectivity_dates, subjectivity, linestyle='-.', linewidth=3, color='blue', label='Subjectivity slope')
+            ax.scatter(subjectivity_dates, subjectivity, marker='*', s=200, color='red', label='Data points')
+            ax.set_title("{} - Subjectivity scores over time{} (B/w 0 and +1)".format(username, label), fontsize=40)
+            ax.set_xlabel("Date", fontsize=30)
+            ax.set_ylabel("Subjectivity score", fontsize=30)
+            ax.tick_params(axis='x', labelsize=20, labelrotation=50)
+            ax.set_yticks(np.arange(0, 1 + step_size, step=step_size))
+            ax.tick_params(axis='y', labelsize=20)
+            fig.tight_layout()
+            ax.grid()
+            ax.legend(loc='best', fontsize=24)
+            fig.savefig("{}/{} - Subjectivity scores over time{}.png".format(results_path, username, label))
+        finally:
+            plt.close(fig)
+
+
+def render_wordcloud(username, word_frequencies, results_path):
+    """
+    Creates and saves the WordCloud of 'username' from a 'WordFrequencyTable' (with its collocations and plurals
+    merged, as when generating from the raw text).
+    """
+    wordcloud = WordCloud(width=800, height=800, background_color='white',
+                          min_font_size=10).generate_from_frequencies(word_frequencies.cloud_counts())
+    fig = plt.figure(figsize=(15, 10), facecolor=None)
+    try:
+        plt.imshow(wordcloud)
+        plt.axis("off")
+        plt.tight_layout(pad=0)
+        fig.savefig("{}/{} - WordCloud of original tweets.png".format(results_path, username))
+    finally:
+        plt.close(fig)
+
+
+
+class ChartRenderer():
+    """
+    Renders the charts of many handles, either inline or in a pool of worker processes.
+    Series are downsampled before being sent to a worker, to keep the data passed around small.
+    """
+    def __init__(self, max_workers=1, max_points=MAX_PLOT_POINTS):
+        self.max_workers = max_workers
+        self.max_points = max_points
+        self._process_pool = None
+        self._pending = list()
+
+
+    def _submit(self, function, *args):
+        if self.max_workers <= 1:
+            function(*args)
+            return
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        # Bound the backlog of queued charts, so the data waiting to be rendered cannot grow without limit.
+        while len(self._pending) >= 2 * self.max_workers:
+            self._pending.pop(0).result()
+        self._pending.append(self._process_pool.submit(function, *args))
+
+
+    def sentiment_charts_job(self, username, df_with_sentiment, results_path):
+        """
+        Returns tuple (function, args) that renders the sentiment charts of 'username' when called,
+        for callers running charts on their own executor (Eg: 'AsyncTweetPipeline').
+        """
+        dates = df_with_sentiment['date'].to_numpy()
+        polarity_dates, polarity = downsample_series(dates, df_with_sentiment['polarity'], self.max_points)
+        subjectivity_dates, subjectivity = downsample_series(dates, df_with_sentiment['subjectivity'], self.max_points)
+        return render_sentiment_charts, (username, polarity_dates, polarity, subjectivity_dates, subjectivity, results_path)
+
+
+    def rollup_charts_job(self, username, df_rollup, results_path, granularity):
+        """
+        Same as 'sentiment_charts_job', for mean polarity and subjectivity per bucket
+        (from the output of 'SentimentRollupIndex.query').
+        """
+        dates = df_rollup['bucket'].to_numpy()
+        polarity_dates, polarity = downsample_series(dates, df_rollup['polarity_mean'], self.max_points)
+        subjectivity_dates, subjectivity = downsample_series(dates, df_rollup['subjectivity_mean'], self.max_points)
+        chart_label = "{} average".format(ROLLUP_CHART_LABELS.get(granularity, granularity))
+        return render_sentiment_charts, (username, polarity_dates, polarity, subjectivity_dates, subjectivity,
+                                         results_path, chart_label)
+
+
+    def wordcloud_job(self, username, word_frequencies, results_path):
+        return render_wordcloud, (username, word_frequencies, results_path)
+
+
+    def render_sentiment_charts(self, username, df_with_sentiment, results_path):
+        function, args = self.sentiment_charts_job(username, df_with_sentiment, results_path)
+        self._submit(function, *args)
+
+
+    def render_rollup_charts(self, username, df_rollup, results_path, granularity):
+        """
+        Plots mean polarity and subjectivity per bucket, from the output of 'SentimentRollupIndex.query'.
+        """
+        function, args = self.rollup_charts_job(username, df_rollup, results_path, granularity)
+        self._submit(function, *args)
+
+
+    def render_wordcloud(self, username, word_frequencies, results_path):
+        function, args = self.wordcloud_job(username, word_frequencies, results_path)
+        self._submit(function, *args)
+
+
+    def wait(self):
+        """
+        Blocks until every submitted chart is saved; re-raises the first rendering error.
+        """
+        pending, self._pending = self._pending, list()
+        for future in pending:
+            future.result()
+
+
+    def close(self):
+        self.wait()
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+            self._process_pool = None
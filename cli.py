@@ -0,0 +1,279 @@
+# Command line entry point: python cli.py {fetch, stream, analyze, compare, render, mentions} --help
+# Only 'argparse' is imported up front; each command imports the modules it needs, so an offline
+# 'analyze' does not load tweepy, the plotting stack or 'twitter_credentials'.
+import argparse
+import sys
+
+ANALYZE_CHUNK_SIZE = 10000
+TOP_MENTIONS = 10
+
+
+
+def command_fetch(options):
+    """
+    Fetches, scores, stores and plots user timelines (same as running 'tweet_analysis.py').
+    """
+    import tweet_analysis
+    usernames = options.usernames or tweet_analysis.usernames
+    number_of_tweets = options.number_of_tweets or tweet_analysis.number_of_tweets
+    tweet_analysis.analyze_timelines(usernames, number_of_tweets, results_path=options.results_path)
+
+
+def command_stream(options):
+    """
+    Streams tweets matching keywords into a JSONL file, optionally with live rolling-window analytics.
+    """
+    from stream_writer import BufferedTweetWriter
+    from twitter_client import TwitterStreamer
+    writer = BufferedTweetWriter(options.output, rotate_bytes=int(options.rotate_mb * 2 ** 20) if options.rotate_mb else None,
+                                 compress_rotated=options.compress_rotated)
+    analytics = None
+    if options.snapshots:
+        import tweet_analysis
+        from live_analytics import RollingWindowAnalytics
+        from word_frequencies import get_stop_words
+        analytics = RollingWindowAnalytics(options.keywords, tweet_analysis.score_tweet, window_seconds=options.window,
+                                           snapshot_filename=options.snapshots, stop_words=get_stop_words())
+    TwitterStreamer().stream_tweets(options.output, options.keywords, writer=writer, analytics=analytics)
+
+
+def _read_tweet_chunks(filename, input_format, chunk_size, summary):
+    """
+    Yields DataFrame chunks of the tweets in 'filename'. For JSONL files, the counts of malformed lines
+    and of skipped (non-tweet) messages are added to 'summary' once the file is read.
+    """
+    import pandas as pd
+    from tweet_json_reader import TweetJsonReader
+    if input_format == 'auto':
+        input_format = 'csv' if filename.lower().endswith('.csv') else 'json'
+    if input_format == 'json':
+        reader = TweetJsonReader(filename, chunk_size=chunk_size)
+        yield from reader
+        summary['malformed_lines'] += reader.malformed_lines
+        summary['skipped_messages'] += reader.skipped_messages
+        return
+    # Scores already present (Eg: in a results CSV) are recomputed.
+    for df in pd.read_csv(filename, chunksize=chunk_size):
+        yield df.drop(columns=['polarity', 'subjectivity'], errors='ignore')
+
+
+def command_analyze(options):
+    """
+    Scores tweets from JSONL stream dumps or CSV files (with a 'tweets' column) without the Twitter API,
+    one chunk at a time. Prints a JSON summary and optionally writes the scored tweets to a CSV file.
+    """
+    import json
+    import os
+    from collections import Counter
+    import tweet_analysis
+    import text_processing
+    from sentiment_cache import SentimentCache
+
+    sentiment_cache = None
+    if not options.no_cache:
+        cache_filename = options.cache or tweet_analysis.SENTIMENT_CACHE_FILENAME
+        os.makedirs(os.path.dirname(cache_filename) or '.', exist_ok=True)
+        sentiment_cache = SentimentCache(cache_filename, tweet_analysis.SENTIMENT_ANALYZER_VERSION)
+    tweet_analyzer = tweet_analysis.TweetAnalyzer(sentiment_cache=sentiment_cache, n_workers=options.workers)
+
+    summary = Counter()
+    polarity_sum = subjectivity_sum = 0.0
+    mentions = Counter()
+    write_header = True
+    try:
+        for filename in options.inputs:
+            for df in _read_tweet_chunks(filename, options.format, options.chunk_size, summary):
+                if 'tweets' not in df.columns:
+                    raise ValueError("'{}' has no 'tweets' column".format(filename))
+                df['tweets'] = df['tweets'].fillna('').astype(str)
+                df['polarity'], df['subjectivity'] = tweet_analyzer.analyze_sentiment_batch(df['tweets'])
+                summary['tweets'] += len(df)
+                summary['retweets'] += int(text_processing.is_retweet(df['tweets']).sum())
+                summary['positive'] += int((df['polarity'] > 0).sum())
+                summary['negative'] += int((df['polarity'] < 0).sum())
+                polarity_sum += float(df['polarity'].sum())
+                subjectivity_sum += float(df['subjectivity'].sum())
+                df_mentions = text_processing.count_mentions(df['tweets'])
+                mentions.update(dict(zip(df_mentions['username'], df_mentions['mentions_received'].tolist())))
+                if options.output:
+                    df.to_csv(options.output, mode='w' if write_header else 'a', header=write_header, index=False)
+                    write_header = False
+    finally:
+        tweet_analyzer.close()
+        if sentiment_cache is not None:
+            print("Sentiment cache: {}".format(sentiment_cache.stats()), file=sys.stderr)
+            sentiment_cache.close()
+
+    tweets = summary['tweets']
+    print(json.dumps({
+        'tweets': tweets,
+        'retweets': summary['retweets'],
+        'positive': summary['positive'],
+        'negative': summary['negative'],
+        'neutral': tweets - summary['positive'] - summary['negative'],
+        'avg_polarity': round(polarity_sum / tweets, 4) if tweets else None,
+        'avg_subjectivity': round(subjectivity_sum / tweets, 4) if tweets else None,
+        'top_mentions': mentions.most_common(TOP_MENTIONS),
+        # Input lines of JSONL files that were not analyzed: invalid JSON, and stream messages other than tweets.
+        'malformed_lines': summary['malformed_lines'],
+        'skipped_messages': summary['skipped_messages']
+    }, indent=2))
+
+
+def command_compare(options):
+    """
+    Compares users (same as running 'sentiment_comparison.py').
+    """
+    import sentiment_comparison
+    sentiment_comparison.compare_users(options.usernames or sentiment_comparison.usernames,
+                                       offline=not options.online)
+
+
+def command_render(options):
+    """
+    Re-renders the charts and word clouds of stored users, without fetching or scoring anything.
+    """
+    import os
+    import tweet_analysis
+    from chart_rendering import ChartRenderer
+    from sentiment_rollups import SentimentRollupIndex
+    from word_frequencies import WordFrequencyTable
+
+    usernames = options.usernames or tweet_analysis.usernames
+    tweet_analyzer = tweet_analysis.TweetAnalyzer()
+    tweet_store = tweet_analysis.open_tweet_store(options.results_path)
+    rollup_index = SentimentRollupIndex(tweet_analysis.RESULTS_DB_FILENAME) if options.granularity else None
+    chart_renderer = ChartRenderer(max_workers=options.workers)
+    try:
+        for username in usernames:
+            df = tweet_store.load(username)
+            if df is None or df.empty:
+                print("No stored tweets - Handle: @{}".format(username))
+                continue
+            word_frequencies_filename = "{}/{} - Word frequencies.json".format(options.results_path, username)
+            word_frequencies = None
+            if os.path.exists(word_frequencies_filename):
+                word_frequencies = WordFrequencyTable.load(word_frequencies_filename)
+            if word_frequencies is None:
+                word_frequencies = tweet_analyzer.count_words(tweet_analyzer.get_original_tweets(df))
+            chart_renderer.render_sentiment_charts(username, df, options.results_path)
+            chart_renderer.render_wordcloud(username, word_frequencies, options.results_path)
+            if rollup_index is not None:
+                if not rollup_index.has_handle(username):
+                    rollup_index.rebuild(username, df)
+                df_rollup = rollup_index.query(username, granularity=options.granularity)
+                chart_renderer.render_rollup_charts(username, df_rollup, options.results_path, options.granularity)
+            print("Rendered charts - Handle: @{}".format(username))
+    finally:
+        chart_renderer.close()
+        if rollup_index is not None:
+            rollup_index.close()
+        if hasattr(tweet_store, 'close'):
+            tweet_store.close()
+
+
+def command_mentions(options):
+    """
+    Queries the cross-user mention graph: most mentioned users, who mentions a user, or how often over time.
+    Stored handles missing from the graph (Eg: stored before it existed) are added first.
+    """
+    import tweet_analysis
+    from mention_graph import MentionGraphIndex
+
+    mention_graph = MentionGraphIndex(tweet_analysis.RESULTS_DB_FILENAME)
+    tweet_store = tweet_analysis.open_tweet_store(options.results_path)
+    try:
+        if hasattr(tweet_store, 'handles'):
+            stored_handles = tweet_store.handles()
+        else:
+            # The CSV store has no index of handles.
+            stored_handles = options.authors or tweet_analysis.usernames
+        for username in stored_handles:
+            if not mention_graph.has_handle(username):
+                df = tweet_store.load(username)
+                if df is not None and not df.empty:
+                    mention_graph.rebuild(username, df)
+        if options.mentioned and options.timeline:
+            df = mention_graph.timeline(options.mentioned, granularity=options.timeline, authors=options.authors,
+                                        start=options.start, end=options.end)
+        elif options.mentioned:
+            df = mention_graph.mentioned_by(options.mentioned, start=options.start, end=options.end)
+        else:
+            df = mention_graph.top_mentioned(options.top, authors=options.authors, start=options.start, end=options.end)
+    finally:
+        mention_graph.close()
+        if hasattr(tweet_store, 'close'):
+            tweet_store.close()
+    if options.output:
+        df.to_csv(options.output, index=False)
+    print(df.to_string(index=False))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Twitter timeline and sentiment analysis.")
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    subparsers.required = True
+
+    fetch = subparsers.add_parser('fetch', help="Fetch and analyze user timelines (needs credentials).")
+    fetch.add_argument('--usernames', nargs='+', help="Handles to fetch (default: 'usernames' in 'twitter_handles.py').")
+    fetch.add_argument('--number-of-tweets', type=int, help="Tweets per handle (default: 'number_of_tweets').")
+    fetch.add_argument('--results-path', default="./results")
+    fetch.set_defaults(function=command_fetch)
+
+    stream = subparsers.add_parser('stream', help="Stream tweets matching keywords into a JSONL file (needs credentials).")
+    stream.add_argument('keywords', nargs='+')
+    stream.add_argument('--output', required=True, help="JSONL file tweets are appended to.")
+    stream.add_argument('--rotate-mb', type=float, help="Start a new file once the current one reaches this size.")
+    stream.add_argument('--compress-rotated', action='store_true', help="Gzip rotated files.")
+    stream.add_argument('--snapshots', help="JSONL file of live analytics snapshots (default: no live analytics).")
+    stream.add_argument('--window', type=float, default=300, help="Live analytics window in seconds.")
+    stream.set_defaults(function=command_stream)
+
+    analyze = subparsers.add_parser('analyze', help="Score tweets from JSONL or CSV files (offline).")
+    analyze.add_argument('inputs', nargs='+', help="JSONL stream dumps or CSV files with a 'tweets' column.")
+    analyze.add_argument('--format', choices=['auto', 'json', 'csv'], default='auto',
+                         help="Input format (default: from the file extension).")
+    analyze.add_argument('--output', help="CSV file to write the scored tweets to.")
+    analyze.add_argument('--chunk-size', type=int, default=ANALYZE_CHUNK_SIZE)
+    analyze.add_argument('--workers', type=int, default=1, help="Processes used to score sentiment.")
+    analyze.add_argument('--cache', help="Persistent sentiment cache (default: the one shared with 'tweet_analysis.py').")
+    analyze.add_argument('--no-cache', action='store_true')
+    analyze.set_defaults(function=command_analyze)
+
+    compare = subparsers.add_parser('compare', help="Compare users (from stored tweets by default).")
+    compare.add_argument('--usernames', nargs='+')
+    compare.add_argument('--online', action='store_true', help="Fetch the tweets again instead (needs credentials).")
+    compare.set_defaults(function=command_compare)
+
+    render = subparsers.add_parser('render', help="Re-render charts and word clouds of stored users.")
+    render.add_argument('--usernames', nargs='+')
+    render.add_argument('--results-path', default="./results")
+    render.add_argument('--granularity', choices=['hour', 'day', 'week'],
+                        help="Also plot the sentiment rollups at this granularity.")
+    render.add_argument('--workers', type=int, default=1, help="Processes used to render charts.")
+    render.set_defaults(function=command_render)
+
+    mentions = subparsers.add_parser('mentions', help="Query who mentions whom across stored users.")
+    mentions.add_argument('--mentioned', help="List who mentions this user instead of the most mentioned users.")
+    mentions.add_argument('--timeline', choices=['hour', 'day', 'week'],
+                          help="With --mentioned, count its mentions per hour, day or week instead.")
+    mentions.add_argument('--authors', nargs='+', help="Only count mentions made by these handles.")
+    mentions.add_argument('--top', type=int, default=TOP_MENTIONS, help="Number of most mentioned users listed.")
+    mentions.add_argument('--start', help="Only count tweets from this date (Eg: 2019-10-01).")
+    mentions.add_argument('--end', help="Only count tweets up to this date.")
+    mentions.add_argument('--output', help="CSV file to also write the result to.")
+    mentions.add_argument('--results-path', default="./results")
+    mentions.set_defaults(function=command_mentions)
+    return parser
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    import warnings
+    warnings.filterwarnings("ignore")
+    options.function(options)
+
+
+
+if __name__ == '__main__':
+    main()
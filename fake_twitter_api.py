@@ -0,0 +1,132 @@
+# Local stand-in for tweepy's 'API', for running the pipeline without Twitter
+import glob
+import os
+import threading
+import time
+from collections import deque
+import pandas as pd
+
+
+
+class FakeStatus():
+    """
+    Minimal stand-in for tweepy's 'Status', with the attributes used by 'TweetAnalyzer'.
+    """
+    def __init__(self, id, text, created_at, source='Twitter Web App', favorite_count=0, retweet_count=0):
+        self.id = id
+        self.text = text
+        self.created_at = created_at
+        self.source = source
+        self.favorite_count = favorite_count
+        self.retweet_count = retweet_count
+
+
+class FakeResponse():
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or dict()
+
+
+class FakeTwitterError(Exception):
+    """
+    Mirrors tweepy's 'TweepError' ('api_code' and 'response' attributes).
+    """
+    def __init__(self, reason, api_code=None, response=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.api_code = api_code
+        self.response = response
+
+
+
+class FakeTwitterAPI():
+    """
+    Serves user timelines from memory, with configurable latency and per-endpoint rate limits.
+    """
+    def __init__(self, timelines, latency=0.0, rate_limit=None, window_seconds=15 * 60):
+        """
+        Parameters:
+            - timelines (dict): Username -> list of 'FakeStatus' objects (any order).
+            - latency (float): Seconds every call sleeps before answering.
+            - rate_limit (int): Calls allowed per endpoint within 'window_seconds' (None disables).
+            - window_seconds (float)
+        """
+        self.timelines = {
+            username: sorted(statuses, key=lambda status: status.id, reverse=True)
+            for username, statuses in timelines.items()
+        }
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.window_seconds = window_seconds
+        self.calls = 0
+        self.rejected_calls = 0
+        self._call_times = dict()
+        self._lock = threading.Lock()
+
+
+    @classmethod
+    def from_results_csv(cls, results_path, usernames=None, **kwargs):
+        """
+        Definition:
+            Builds an API that replays the tweets stored as '<username> - Tweet analysis (all).csv'
+            files in 'results_path' (Eg: written by 'tweet_analysis.py' with the CSV backend or 'export_csv').
+
+        Parameters:
+            - results_path (string)
+            - usernames (list of strings): Handles to replay (None replays every stored handle).
+            - kwargs: Passed on to 'FakeTwitterAPI' (Eg: 'latency', 'rate_limit').
+
+        Returns:
+            - 'FakeTwitterAPI' object.
+
+        """
+        suffix = " - Tweet analysis (all).csv"
+        timelines = dict()
+        for csv_filename in glob.glob(os.path.join(results_path, "*" + suffix)):
+            username = os.path.basename(csv_filename)[:-len(suffix)]
+            if usernames is not None and username not in usernames:
+                continue
+            df = pd.read_csv(csv_filename, usecols=['tweets', 'id', 'date', 'source', 'likes', 'retweets'])
+            dates = pd.to_datetime(df['date']).dt.to_pydatetime()
+            timelines[username] = [
+                FakeStatus(int(id), str(text), date, source, int(likes), int(retweets))
+                for text, id, date, source, likes, retweets in
+                zip(df['tweets'], df['id'], dates, df['source'], df['likes'], df['retweets'])
+            ]
+        return cls(timelines, **kwargs)
+
+
+    def _check_rate_limit(self, endpoint):
+        with self._lock:
+            self.calls += 1
+            if self.rate_limit is None:
+                return
+            now = time.time()
+            call_times = self._call_times.setdefault(endpoint, deque())
+            while call_times and call_times[0] <= now - self.window_seconds:
+                call_times.popleft()
+            if len(call_times) >= self.rate_limit:
+                self.rejected_calls += 1
+                reset_at = call_times[0] + self.window_seconds
+                response = FakeResponse(429, {'x-rate-limit-reset': str(reset_at)})
+                raise FakeTwitterError("Rate limit exceeded", api_code=88, response=response)
+            call_times.append(now)
+
+
+    def user_timeline(self, screen_name=None, id=None, count=20, since_id=None, max_id=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        self._check_rate_limit('user_timeline')
+        username = screen_name if screen_name is not None else id
+        if username not in self.timelines:
+            raise FakeTwitterError("Sorry, that page does not exist.", api_code=34, response=FakeResponse(404))
+        page = list()
+        for status in self.timelines[username]:
+            if max_id is not None and status.id > max_id:
+                continue
+            if since_id is not None and status.id <= since_id:
+                break
+            page.append(status)
+            if len(page) >= count:
+                break
+        return page
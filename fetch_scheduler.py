@@ -0,0 +1,217 @@
+# Concurrent, rate-limit-aware timeline fetching
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Standard (user auth) limit of 'statuses/user_timeline': 900 requests per 15 minute window.
+DEFAULT_RATE_LIMITS = {
+    'user_timeline': (900, 15 * 60)
+}
+# Largest 'count' accepted by 'statuses/user_timeline'.
+MAX_PAGE_SIZE = 200
+
+
+
+def is_rate_limit_error(error):
+    """
+    Returns True if 'error' (Eg: tweepy's 'RateLimitError') signals an exhausted rate-limit window.
+    """
+    if getattr(error, 'api_code', None) == 88:
+        return True
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) == 429
+
+
+def get_retry_after(error):
+    """
+    Returns seconds until the rate-limit window resets (from the 'x-rate-limit-reset' header), or None.
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or dict()
+    reset_at = headers.get('x-rate-limit-reset')
+    if reset_at is None:
+        return None
+    return max(float(reset_at) - time.time(), 0.0)
+
+
+
+class RateLimiter():
+    """
+    Sliding-window rate limiter shared by all worker threads, with one window per endpoint.
+    """
+    def __init__(self, rate_limits=None):
+        """
+        Parameters:
+            - rate_limits (dict): Endpoint name -> tuple of (max_calls, window_seconds).
+              Endpoints that are not listed are not limited.
+        """
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits)
+        self._calls = {endpoint: deque() for endpoint in self.rate_limits}
+        self._blocked_until = dict()
+        self._lock = threading.Lock()
+
+
+    def acquire(self, endpoint):
+        """
+        Blocks until a call to 'endpoint' is allowed, then records it.
+        """
+        while True:
+            with self._lock:
+                now = time.time()
+                wait = self._blocked_until.get(endpoint, 0.0) - now
+                if wait <= 0 and endpoint in self.rate_limits:
+                    max_calls, window_seconds = self.rate_limits[endpoint]
+                    calls = self._calls[endpoint]
+                    while calls and calls[0] <= now - window_seconds:
+                        calls.popleft()
+                    if len(calls) >= max_calls:
+                        wait = calls[0] + window_seconds - now
+                if wait <= 0:
+                    if endpoint in self.rate_limits:
+                        self._calls[endpoint].append(now)
+                    return
+            time.sleep(wait)
+
+
+    def block(self, endpoint, seconds):
+        """
+        Holds back every call to 'endpoint' for the next 'seconds' (Eg: after the API reported a rate limit).
+        """
+        with self._lock:
+            self._blocked_until[endpoint] = max(self._blocked_until.get(endpoint, 0.0), time.time() + seconds)
+
+
+
+class TimelineFetchScheduler():
+    """
+    Pages user timelines for many handles concurrently, with a bounded pool of worker threads
+    that share a 'RateLimiter'. Rate-limit errors are retried with exponential backoff.
+    """
+    def __init__(self, api, max_workers=4, page_size=MAX_PAGE_SIZE, rate_limits=None,
+                 max_retries=5, backoff_base=1.0, backoff_max=15 * 60):
+        """
+        Parameters:
+            - api: tweepy 'API' object (or any object with a compatible 'user_timeline' method).
+            - max_workers (int): Number of handles fetched at the same time.
+            - page_size (int): Tweets requested per call (at most 200).
+            - rate_limits (dict): See 'RateLimiter'.
+            - max_retries (int): Retries of a single call after rate-limit errors.
+            - backoff_base, backoff_max (float): Backoff is backoff_base * 2^attempt seconds, capped at backoff_max.
+        """
+        self.api = api
+        self.max_workers = max_workers
+        self.page_size = min(page_size, MAX_PAGE_SIZE)
+        self.rate_limiter = RateLimiter(rate_limits)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.api_calls = 0
+        self.rate_limit_errors = 0
+        self._counter_lock = threading.Lock()
+
+
+    def call_api(self, endpoint, **kwargs):
+        """
+        Calls 'api.<endpoint>(**kwargs)' within the rate limits, backing off on rate-limit errors.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(endpoint)
+            with self._counter_lock:
+                self.api_calls += 1
+            try:
+                return getattr(self.api, endpoint)(**kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                with self._counter_lock:
+                    self.rate_limit_errors += 1
+                delay = get_retry_after(e)
+                if delay is None:
+                    delay = self.backoff_base * 2 ** attempt
+                self.rate_limiter.block(endpoint, min(delay, self.backoff_max))
+
+
+    def fetch_user_timeline(self, username, number_of_tweets, since_id=None):
+        """
+        Definition:
+            Pages backwards through the timeline of 'username' (newest first) using 'max_id'.
+
+        Parameters:
+            - username (string)
+            - number_of_tweets (int): Maximum number of tweets to fetch.
+            - since_id (int): Only fetch tweets newer than this id (None fetches the latest tweets).
+
+        Returns:
+            - List of tweets (tweepy 'Status' objects), newest first.
+
+        """
+        tweets = list()
+        max_id = None
+        while len(tweets) < number_of_tweets:
+            params = {'screen_name': username, 'count': min(self.page_size, number_of_tweets - len(tweets))}
+            if max_id is not None:
+                params['max_id'] = max_id
+            if since_id is not None:
+                params['since_id'] = since_id
+            page = self.call_api('user_timeline', **params)
+            if not page:
+                break
+            tweets.extend(page)
+            max_id = page[-1].id - 1
+        return tweets[:number_of_tweets]
+
+
+    def fetch_timelines(self, usernames, number_of_tweets, since_ids=None, max_in_flight=None):
+        """
+        Definition:
+            Fetches the timelines of all 'usernames' concurrently.
+
+        Parameters:
+            - usernames (list of strings)
+            - number_of_tweets (int): Maximum number of tweets per handle.
+            - since_ids (dict): Optional username -> since_id (see 'fetch_user_timeline').
+            - max_in_flight (int): Most handles fetched or fetched but not yet consumed at a time
+              (defaults to twice 'max_workers'), so a slow consumer bounds how many timelines are held.
+
+        Returns:
+            - Generator of tuples (username, tweets, error), in order of completion, so each handle
+              can be analyzed as soon as it is ready. 'tweets' is None if fetching failed with 'error'.
+
+        """
+        since_ids = since_ids or dict()
+        max_in_flight = max_in_flight or 2 * self.max_workers
+        usernames = iter(usernames)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = dict()
+
+        def submit_next():
+            for username in usernames:
+                future = executor.submit(self.fetch_user_timeline, username, number_of_tweets, since_ids.get(username))
+                futures[future] = username
+                return
+
+        try:
+            for _ in range(max_in_flight):
+                submit_next()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    username = futures.pop(future)
+                    try:
+                        yield username, future.result(), None
+                    except Exception as e:
+                        yield username, None, e
+                    # The next handle starts once this one has been consumed.
+                    submit_next()
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+
+    def stats(self):
+        return {
+            'api_calls': self.api_calls,
+            'rate_limit_errors': self.rate_limit_errors
+        }
@@ -0,0 +1,292 @@
+# Per-stage run instrumentation and profiling
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILERS = ('cprofile', 'sampling')
+# Functions listed per profile in the run report.
+PROFILE_TOP_N = 25
+# Frames of these files (thread start-up and the instrumentation itself) are left out of sampled stacks.
+SAMPLING_SKIPPED_FILES = {'threading.py', 'thread.py', 'instrumentation.py'}
+
+
+
+class _SamplingProfiler():
+    """
+    Samples the stacks of registered threads every 'interval' seconds from a background thread,
+    and counts identical stacks (in the 'folded' format read by flame graph tools).
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._thread_ids = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+
+    def add_thread(self, thread_id):
+        with self._lock:
+            self._thread_ids[thread_id] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+
+
+    def remove_thread(self, thread_id):
+        with self._lock:
+            self._thread_ids[thread_id] -= 1
+            if self._thread_ids[thread_id] <= 0:
+                del self._thread_ids[thread_id]
+
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                thread_ids = list(self._thread_ids)
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                stack = list()
+                while frame is not None:
+                    code = frame.f_code
+                    filename = os.path.basename(code.co_filename)
+                    if filename not in SAMPLING_SKIPPED_FILES:
+                        stack.append("{} ({}:{})".format(code.co_name, filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[';'.join(reversed(stack))] += 1
+                    self.samples += 1
+
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+    def top_functions(self, n):
+        """
+        Returns list of (function, share of samples it was running in), most frequent first.
+        """
+        functions = Counter()
+        for stack, count in self.stacks.items():
+            for function in set(stack.split(';')):
+                functions[function] += count
+        return [(function, round(count / self.samples, 4)) for function, count in functions.most_common(n)]
+
+
+    def save(self, filename):
+        with open(filename, 'w') as profile_file:
+            for stack, count in self.stacks.most_common():
+                profile_file.write("{} {}\n".format(stack, count))
+
+
+
+class RunInstrumentation():
+    """
+    Records wall time, CPU time, peak memory and item counts of each stage of a run, per handle,
+    and optionally profiles one stage. 'report' summarizes the records per stage and per handle.
+
+    CPU time is the time of the thread running the stage, so work handed to other processes
+    (Eg: 'sentiment_workers' or 'render_workers' above 1) is not counted. Peak memory is the peak of
+    Python allocations (traced with 'tracemalloc') while the stage was running, so stages running
+    at the same time share their peaks.
+    """
+    def __init__(self, trace_memory=False, profile_stage=None, profiler='cprofile', profile_filename=None,
+                 sampling_interval=0.005):
+        """
+        Parameters:
+            - trace_memory (bool): Record peak memory ('peak_memory' is None otherwise). Tracing every
+              allocation slows the run down, by 2 to 3 times for TextBlob scoring.
+            - profile_stage (string): Name of the stage to profile (None disables profiling).
+            - profiler (string): 'cprofile' (deterministic, every call) or 'sampling' (low overhead, stacks only).
+            - profile_filename (string): File the profile is saved to ('.prof' for cProfile, folded stacks
+              for sampling); None keeps only the summary in the report.
+            - sampling_interval (float): Seconds between two samples of the sampling profiler.
+        """
+        if profiler not in PROFILERS:
+            raise ValueError("profiler must be one of {}".format(PROFILERS))
+        self.trace_memory = trace_memory
+        self.profile_stage = profile_stage
+        self.profiler = profiler
+        self.profile_filename = profile_filename
+        self.records = list()
+        self.started_at = datetime.datetime.now()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._lock = threading.Lock()
+        self._active = list()
+        self._profile_stats = None
+        self._sampling_profiler = _SamplingProfiler(sampling_interval) if profile_stage and profiler == 'sampling' else None
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+    def _attribute_peak(self):
+        # Called on every stage start and end: the peak since the previous event belongs to every stage running.
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for record in self._active:
+            record['peak_memory'] = max(record['peak_memory'], peak)
+
+
+    @contextmanager
+    def stage(self, name, handle=None, measure_cpu=True):
+        """
+        Definition:
+            Context manager recording one run of stage 'name' for 'handle'.
+
+        Parameters:
+            - name (string): Stage name (Eg: 'fetch', 'score').
+            - handle (string): Handle the stage works on (None for work spanning handles).
+            - measure_cpu (bool): False when the body awaits work done elsewhere (Eg: in an event loop).
+
+        Returns:
+            - Record dictionary; set its 'items' key to the number of items processed.
+
+        """
+        record = {'stage': name, 'handle': handle, 'wall_seconds': None, 'cpu_seconds': None,
+                  'peak_memory': 0 if self.trace_memory else None, 'items': None}
+        with self._lock:
+            if self.trace_memory:
+                self._attribute_peak()
+            self._active.append(record)
+        profile = None
+        thread_id = threading.get_ident()
+        if name == self.profile_stage and measure_cpu:
+            if self._sampling_profiler is not None:
+                self._sampling_profiler.add_thread(thread_id)
+            else:
+                profile = cProfile.Profile()
+                profile.enable()
+        cpu_start = time.thread_time()
+        wall_start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - wall_start, 6)
+            if measure_cpu:
+                record['cpu_seconds'] = round(time.thread_time() - cpu_start, 6)
+            if profile is not None:
+                profile.disable()
+            elif name == self.profile_stage and self._sampling_profiler is not None and measure_cpu:
+                self._sampling_profiler.remove_thread(thread_id)
+            with self._lock:
+                if self.trace_memory:
+                    self._attribute_peak()
+                self._active.remove(record)
+                if profile is not None:
+                    if self._profile_stats is None:
+                        self._profile_stats = pstats.Stats(profile)
+                    else:
+                        self._profile_stats.add(profile)
+                self.records.append(record)
+
+
+    def wrap(self, name, handle, function, count_items=None):
+        """
+        Returns function calling 'function' within 'stage(name, handle)', in whichever thread it runs
+        (Eg: an executor thread). 'count_items' maps the result to the 'items' of the record.
+        """
+        def instrumented(*args):
+            with self.stage(name, handle) as record:
+                result = function(*args)
+                if count_items is not None:
+                    record['items'] = count_items(result)
+                return result
+        return instrumented
+
+
+    def _profile_summary(self):
+        if self._sampling_profiler is not None:
+            return {'profiler': 'sampling', 'samples': self._sampling_profiler.samples,
+                    'top_functions': self._sampling_profiler.top_functions(PROFILE_TOP_N)}
+        if self._profile_stats is None:
+            return None
+        output = io.StringIO()
+        self._profile_stats.stream = output
+        self._profile_stats.sort_stats('cumulative').print_stats(PROFILE_TOP_N)
+        return {'profiler': 'cprofile', 'total_seconds': round(self._profile_stats.total_tt, 6),
+                'top_functions': output.getvalue().strip().splitlines()}
+
+
+    def _summarize(self, key):
+        summary = dict()
+        for record in self.records:
+            if record[key] is None:
+                continue
+            entry = summary.setdefault(record[key], {'runs': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                                     'peak_memory': None, 'items': 0})
+            entry['runs'] += 1
+            entry['wall_seconds'] = round(entry['wall_seconds'] + record['wall_seconds'], 6)
+            entry['cpu_seconds'] = round(entry['cpu_seconds'] + (record['cpu_seconds'] or 0.0), 6)
+            if record['peak_memory'] is not None:
+                entry['peak_memory'] = max(entry['peak_memory'] or 0, record['peak_memory'])
+            entry['items'] += record['items'] or 0
+        return summary
+
+
+    def report(self):
+        """
+        Returns dictionary of run totals, per-stage and per-handle summaries, every record and the profile.
+        """
+        try:
+            # Unix only: the rusage fields are left out elsewhere (Eg: on Windows).
+            import resource
+        except ImportError:
+            resource = None
+        report = {
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'wall_seconds': round(time.perf_counter() - self._wall_start, 6),
+            'cpu_seconds': round(time.process_time() - self._cpu_start, 6),
+            'stages': self._summarize('stage'),
+            'handles': self._summarize('handle'),
+            'records': list(self.records),
+            'profile_stage': self.profile_stage,
+            'profile': self._profile_summary()
+        }
+        if resource is not None:
+            children = resource.getrusage(resource.RUSAGE_CHILDREN)
+            report['child_process_cpu_seconds'] = round(children.ru_utime + children.ru_stime, 6)
+            # 'ru_maxrss' is in kilobytes on Linux (bytes on macOS).
+            report['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+        return report
+
+
+    def write_report(self, report_filename, extra=None):
+        """
+        Definition:
+            Saves 'report' (updated with 'extra', Eg: component statistics) as JSON, and the profile
+            to 'profile_filename' if set.
+
+        Parameters:
+            - report_filename (string)
+            - extra (dict)
+
+        Returns:
+            - The report dictionary.
+
+        """
+        if self._sampling_profiler is not None:
+            self._sampling_profiler.stop()
+        report = self.report()
+        report.update(extra or dict())
+        with open(report_filename, 'w') as report_file:
+            json.dump(report, report_file, indent=2, default=str)
+        if self.profile_filename is not None:
+            if self._sampling_profiler is not None:
+                self._sampling_profiler.save(self.profile_filename)
+            elif self._profile_stats is not None:
+                self._profile_stats.dump_stats(self.profile_filename)
+        return report
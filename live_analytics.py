@@ -0,0 +1,269 @@
+# Rolling-window analytics for live (streamed) tweets
+import json
+import queue
+import re
+import threading
+import time
+from collections import Counter, deque
+import numpy as np
+import text_processing
+from tweet_json_reader import TweetJsonReader
+from word_frequencies import TOKEN_PATTERN
+
+# Edges of the polarity histogram: 8 bins of width 0.25 between -1 and +1.
+POLARITY_BIN_EDGES = np.linspace(-1, 1, 9)
+# Key of the aggregates covering every tweet in the window, whichever keyword it matched.
+ALL_TWEETS = '*'
+# Words of a tweet (or keyword) for keyword matching, with their '#' or '@' if any.
+TERM_PATTERN = re.compile(r"[#@]?\w+")
+# Marks the end of the queue of 'LiveAnalyticsWorker'.
+_DONE = object()
+
+
+
+class _WindowAggregate():
+    """
+    Running sums and counters for the tweets currently in the window (for one keyword).
+    """
+    def __init__(self):
+        self.count = 0
+        self.polarity_sum = 0.0
+        self.subjectivity_sum = 0.0
+        self.polarity_histogram = np.zeros(len(POLARITY_BIN_EDGES) - 1, dtype=np.int64)
+        self.mentions = Counter()
+        self.tokens = Counter()
+
+
+    def add(self, polarity, subjectivity, polarity_bin, mentions, tokens, sign=1):
+        self.count += sign
+        self.polarity_sum += sign * polarity
+        self.subjectivity_sum += sign * subjectivity
+        self.polarity_histogram[polarity_bin] += sign
+        if sign > 0:
+            self.mentions.update(mentions)
+            self.tokens.update(tokens)
+        else:
+            # Drop counters that reach zero, so memory stays bounded by what is in the window.
+            for counter, items in ((self.mentions, mentions), (self.tokens, tokens)):
+                for item in items:
+                    counter[item] -= 1
+                    if counter[item] <= 0:
+                        del counter[item]
+
+
+    def snapshot(self, top_n):
+        return {
+            'count': self.count,
+            'polarity_mean': round(self.polarity_sum / self.count, 4) if self.count else None,
+            'subjectivity_mean': round(self.subjectivity_sum / self.count, 4) if self.count else None,
+            'polarity_histogram': self.polarity_histogram.tolist(),
+            'top_mentions': self.mentions.most_common(top_n),
+            'top_tokens': self.tokens.most_common(top_n)
+        }
+
+
+
+class RollingWindowAnalytics():
+    """
+    Scores each incoming tweet as it arrives and keeps sliding-window aggregates per keyword
+    (sentiment mean and distribution, top mentions and top tokens) in bounded memory.
+    Snapshots are appended to a JSONL file every 'snapshot_interval' seconds.
+    """
+    def __init__(self, keywords, score_function, window_seconds=300, max_window_tweets=100000,
+                 snapshot_filename=None, snapshot_interval=10, top_n=10, stop_words=frozenset()):
+        """
+        Parameters:
+            - keywords (list of strings): Tracked keywords (Eg: 'hash_tag_list'). As with the 'track' filter
+              of the streaming API, a tweet matches a keyword if it contains all of its words as whole words,
+              in any order and case; a plain word also matches its hashtag or mention ('ai' matches '#AI'
+              but not 'said'), while a hashtag only matches that hashtag ('#ufc' does not match '#ufc250').
+            - score_function (function): Maps raw tweet text to a (polarity, subjectivity) tuple.
+            - window_seconds (float): Length of the sliding window.
+            - max_window_tweets (int): Hard cap on tweets kept in the window, whatever their age.
+            - snapshot_filename (string): JSONL file snapshots are appended to (None disables snapshots).
+            - snapshot_interval (float): Seconds between snapshots.
+            - top_n (int): Number of top mentions / tokens per snapshot.
+            - stop_words (set of strings): Tokens left out of the top tokens.
+        """
+        self.keywords = list(keywords)
+        self._keyword_terms = [TERM_PATTERN.findall(keyword.lower()) for keyword in self.keywords]
+        self.score_function = score_function
+        self.window_seconds = window_seconds
+        self.max_window_tweets = max_window_tweets
+        self.snapshot_filename = snapshot_filename
+        self.snapshot_interval = snapshot_interval
+        self.top_n = top_n
+        self.stop_words = stop_words
+
+        self.tweets_seen = 0
+        self.snapshots_written = 0
+        self._window = deque()
+        self._aggregates = {keyword: _WindowAggregate() for keyword in self.keywords + [ALL_TWEETS]}
+        self._last_snapshot_at = time.time()
+
+
+    def matching_keywords(self, text):
+        words = set()
+        for term in TERM_PATTERN.findall(text.lower()):
+            words.add(term)
+            if term[0] in '#@':
+                words.add(term[1:])
+        return [keyword for keyword, terms in zip(self.keywords, self._keyword_terms) if terms and words.issuperset(terms)]
+
+
+    def add(self, text, timestamp=None):
+        """
+        Scores one tweet and adds it to the window (then evicts expired tweets, and writes a snapshot if due).
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        polarity, subjectivity = self.score_function(text)
+        polarity_bin = int(np.clip(np.digitize(polarity, POLARITY_BIN_EDGES) - 1, 0, len(POLARITY_BIN_EDGES) - 2))
+        mentions = text_processing.MENTION_PATTERN.findall(text)
+        tokens = [token for token in TOKEN_PATTERN.findall(text_processing.clean_tweet(text).lower()) if token not in self.stop_words]
+        keywords = self.matching_keywords(text) + [ALL_TWEETS]
+
+        entry = (timestamp, keywords, polarity, subjectivity, polarity_bin, mentions, tokens)
+        self._window.append(entry)
+        for keyword in keywords:
+            self._aggregates[keyword].add(polarity, subjectivity, polarity_bin, mentions, tokens)
+        self.tweets_seen += 1
+
+        self.evict(timestamp)
+        if self.snapshot_filename is not None and timestamp - self._last_snapshot_at >= self.snapshot_interval:
+            self.write_snapshot(timestamp)
+
+
+    def evict(self, now=None):
+        """
+        Removes tweets older than 'window_seconds' (or beyond 'max_window_tweets') from the aggregates.
+        """
+        now = time.time() if now is None else now
+        while self._window and (self._window[0][0] < now - self.window_seconds or len(self._window) > self.max_window_tweets):
+            _, keywords, polarity, subjectivity, polarity_bin, mentions, tokens = self._window.popleft()
+            for keyword in keywords:
+                self._aggregates[keyword].add(polarity, subjectivity, polarity_bin, mentions, tokens, sign=-1)
+
+
+    def snapshot(self, now=None):
+        """
+        Returns dictionary of the current window aggregates, per keyword and for all tweets ('*').
+        """
+        now = time.time() if now is None else now
+        return {
+            'timestamp': now,
+            'window_seconds': self.window_seconds,
+            'tweets_in_window': len(self._window),
+            'tweets_seen': self.tweets_seen,
+            'polarity_bin_edges': POLARITY_BIN_EDGES.tolist(),
+            'keywords': {keyword: aggregate.snapshot(self.top_n) for keyword, aggregate in self._aggregates.items()}
+        }
+
+
+    def write_snapshot(self, now=None):
+        now = time.time() if now is None else now
+        self.evict(now)
+        with open(self.snapshot_filename, 'a') as snapshot_file:
+            snapshot_file.write(json.dumps(self.snapshot(now)) + '\n')
+        self.snapshots_written += 1
+        self._last_snapshot_at = now
+
+
+
+class LiveAnalyticsWorker():
+    """
+    Runs a 'RollingWindowAnalytics' on a background thread, so the stream listener only queues raw tweets and
+    never waits on parsing, scoring or snapshot writes. Tweets are timestamped when queued; once 'max_queued'
+    tweets are waiting, newer ones are dropped (and counted) rather than slowing down the stream.
+    """
+    def __init__(self, analytics, max_queued=10000):
+        """
+        Parameters:
+            - analytics (RollingWindowAnalytics)
+            - max_queued (int): Most tweets waiting to be analyzed; newer ones are dropped.
+        """
+        self.analytics = analytics
+        self.received = 0
+        self.dropped = 0
+        self.errors = 0
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._worker = threading.Thread(target=self._run, name='LiveAnalyticsWorker', daemon=True)
+        self._worker.start()
+
+
+    def submit(self, data):
+        """
+        Queues one tweet (raw JSON string, as received from the stream); never blocks.
+        """
+        self.received += 1
+        try:
+            self._queue.put_nowait((time.time(), data))
+        except queue.Full:
+            self.dropped += 1
+
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            timestamp, data = item
+            try:
+                status = json.loads(data)
+                # Stream messages other than tweets (Eg: deletions) have no text.
+                if 'text' in status:
+                    self.analytics.add(status['text'], timestamp)
+            except Exception as e:
+                self.errors += 1
+                print("Error in live analytics %s" % str(e))
+
+
+    def close(self):
+        """
+        Analyzes the tweets still queued, then writes a last snapshot (if snapshots are enabled).
+        """
+        self._queue.put(_DONE)
+        self._worker.join()
+        if self.analytics.snapshot_filename is not None:
+            self.analytics.write_snapshot()
+
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'analyzed': self.analytics.tweets_seen,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'queued': self._queue.qsize()
+        }
+
+
+
+def replay_jsonl(json_filename, analytics, rate=None, chunk_size=1000):
+    """
+    Definition:
+        Feeds a captured JSONL stream dump (Eg: written by 'TwitterListener') through 'analytics',
+        to test or benchmark live analytics offline.
+
+    Parameters:
+        - json_filename (string)
+        - analytics (RollingWindowAnalytics)
+        - rate (float): Tweets per second to replay at (None replays as fast as possible).
+        - chunk_size (int): Tweets read from the file at a time.
+
+    Returns:
+        - Integer count of tweets replayed.
+
+    """
+    replayed = 0
+    started_at = time.time()
+    for df_chunk in TweetJsonReader(json_filename, chunk_size=chunk_size):
+        for text in df_chunk['tweets']:
+            if rate:
+                delay = started_at + replayed / rate - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            analytics.add(text)
+            replayed += 1
+    if analytics.snapshot_filename is not None:
+        analytics.write_snapshot()
+    return replayed
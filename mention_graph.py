@@ -0,0 +1,322 @@
+# Cross-user mention graph, kept in SQLite
+import sqlite3
+import numpy as np
+import pandas as pd
+import text_processing
+from sentiment_rollups import GRANULARITIES, bucket_start
+from tweet_store import end_bound
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+
+class MentionGraphIndex():
+    """
+    Who mentions whom, across every analyzed handle, kept in SQLite so it grows with each run instead
+    of being recounted from the stored tweets.
+    Edges ('mention_edges') record each mention with its tweet id and date, for time-windowed queries;
+    per (author, mentioned) totals ('mention_counts') answer whole-history queries without scanning them.
+    Mentions are full handles, underscores included ('text_processing.HANDLE_PATTERN'); a graph indexed with another
+    pattern is emptied when opened, so its handles are indexed again.
+    Handles are matched case-insensitively, as on Twitter, and are stored without the '@'. A user mentioned
+    several times in one tweet counts once; retweets count as mentions of the retweeted user.
+    Indexed handles ('mention_handles') are recorded with their newest tweet id, including handles that
+    mention nobody, so they are not indexed again.
+    Date ranges are inclusive: an 'end' without a time (Eg: '2019-10-07') includes that whole day.
+    """
+    def __init__(self, db_filename, batch_size=500, timeout=30):
+        self.db_filename = db_filename
+        self.batch_size = batch_size
+        # Shared with the pipeline's database thread, one call at a time.
+        self.connection = sqlite3.connect(db_filename, timeout=timeout, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS mention_edges (
+                author TEXT NOT NULL COLLATE NOCASE,
+                mentioned TEXT NOT NULL COLLATE NOCASE,
+                tweet_id INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                PRIMARY KEY (author, tweet_id, mentioned)
+            );
+            CREATE INDEX IF NOT EXISTS idx_mention_edges_mentioned_date ON mention_edges (mentioned, date);
+            CREATE INDEX IF NOT EXISTS idx_mention_edges_date ON mention_edges (date);
+            CREATE TABLE IF NOT EXISTS mention_counts (
+                author TEXT NOT NULL COLLATE NOCASE,
+                mentioned TEXT NOT NULL COLLATE NOCASE,
+                count INTEGER NOT NULL,
+                first_date TEXT NOT NULL,
+                last_date TEXT NOT NULL,
+                PRIMARY KEY (author, mentioned)
+            );
+            CREATE INDEX IF NOT EXISTS idx_mention_counts_mentioned ON mention_counts (mentioned);
+            CREATE TABLE IF NOT EXISTS mention_handles (
+                author TEXT PRIMARY KEY COLLATE NOCASE,
+                latest_id INTEGER NOT NULL,
+                tweets INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS mention_graph_info (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        row = self.connection.execute("SELECT value FROM mention_graph_info WHERE key = 'handle_pattern'").fetchone()
+        if row is None or row[0] != text_processing.HANDLE_PATTERN.pattern:
+            # Mentions found with another pattern (Eg: handles cut at an underscore); the pipeline re-indexes every handle.
+            with self.connection:
+                for table in ('mention_edges', 'mention_counts', 'mention_handles'):
+                    self.connection.execute("DELETE FROM {}".format(table))
+                self.connection.execute("INSERT OR REPLACE INTO mention_graph_info (key, value) VALUES ('handle_pattern', ?)",
+                                        (text_processing.HANDLE_PATTERN.pattern,))
+        self.connection.commit()
+
+
+    def close(self):
+        self.connection.close()
+
+
+    def authors(self):
+        return [row[0] for row in self.connection.execute("SELECT author FROM mention_handles ORDER BY author")]
+
+
+    def has_handle(self, username):
+        return self.latest_id(username) is not None
+
+
+    def latest_id(self, username):
+        """
+        Returns id of the newest indexed tweet of 'username', or None if the handle was never indexed.
+        """
+        row = self.connection.execute("SELECT latest_id FROM mention_handles WHERE author = ?", (username,)).fetchone()
+        return row[0] if row is not None else None
+
+
+    def _stored_tweet_ids(self, username, tweet_ids):
+        stored_ids = set()
+        for start in range(0, len(tweet_ids), self.batch_size):
+            batch = tweet_ids[start:start + self.batch_size]
+            query = "SELECT DISTINCT tweet_id FROM mention_edges WHERE author = ? AND tweet_id IN ({})".format(
+                ','.join('?' * len(batch)))
+            stored_ids.update(row[0] for row in self.connection.execute(query, [username] + batch))
+        return stored_ids
+
+
+    def update(self, username, df_new):
+        """
+        Definition:
+            Adds the mentions made in newly analyzed tweets of 'username'.
+            Pass only the new tweets (Eg: 'df_added' from 'TweetStore.merge'); tweets already indexed are skipped.
+
+        Parameters:
+            - username (string)
+            - df_new (Pandas DataFrame): With columns 'tweets', 'id' and 'date'.
+
+        Returns:
+            - Integer count of mentions added.
+
+        """
+        if df_new.empty:
+            return 0
+        df_edges = pd.DataFrame({
+            'tweet_id': df_new['id'].astype('int64').to_numpy(),
+            'date': pd.to_datetime(df_new['date']).dt.strftime(DATE_FORMAT).to_numpy(),
+            'mentioned': text_processing.extract_handles(df_new['tweets']).to_numpy()
+        }).explode('mentioned').dropna(subset=['mentioned'])
+        if not df_edges.empty:
+            # One edge per mention of a user in a tweet, whatever the case it was written in.
+            df_edges = df_edges[~df_edges.assign(key=df_edges['mentioned'].str.lower()).duplicated(subset=['tweet_id', 'key'])]
+            stored_ids = self._stored_tweet_ids(username, [int(tweet_id) for tweet_id in df_edges['tweet_id'].unique()])
+            if stored_ids:
+                df_edges = df_edges[~df_edges['tweet_id'].isin(stored_ids)]
+
+        with self.connection:
+            if not df_edges.empty:
+                grouped = df_edges.groupby(df_edges['mentioned'].str.lower())
+                df_counts = pd.DataFrame({
+                    'mentioned': grouped['mentioned'].first(),
+                    'count': grouped.size(),
+                    'first_date': grouped['date'].min(),
+                    'last_date': grouped['date'].max()
+                })
+                self.connection.executemany("""
+                    INSERT OR IGNORE INTO mention_edges (author, mentioned, tweet_id, date) VALUES (?, ?, ?, ?)
+                """, [(username, mentioned, int(tweet_id), date)
+                      for tweet_id, date, mentioned in df_edges.itertuples(index=False)])
+                self.connection.executemany("""
+                    INSERT INTO mention_counts (author, mentioned, count, first_date, last_date) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (author, mentioned) DO UPDATE SET
+                        count = count + excluded.count,
+                        first_date = MIN(first_date, excluded.first_date),
+                        last_date = MAX(last_date, excluded.last_date)
+                """, [(username, mentioned, int(count), first_date, last_date)
+                      for mentioned, count, first_date, last_date in df_counts.itertuples(index=False)])
+            # 'tweets' counts tweets offered, so it may count a tweet offered twice more than once.
+            self.connection.execute("""
+                INSERT INTO mention_handles (author, latest_id, tweets) VALUES (?, ?, ?)
+                ON CONFLICT (author) DO UPDATE SET
+                    latest_id = MAX(latest_id, excluded.latest_id),
+                    tweets = tweets + excluded.tweets
+            """, (username, int(df_new['id'].max()), len(df_new)))
+        return len(df_edges)
+
+
+    def rebuild(self, username, df_all):
+        """
+        Replaces the mentions made by 'username' with the ones in 'df_all' (every stored tweet of that handle).
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM mention_edges WHERE author = ?", (username,))
+            self.connection.execute("DELETE FROM mention_counts WHERE author = ?", (username,))
+            self.connection.execute("DELETE FROM mention_handles WHERE author = ?", (username,))
+        return self.update(username, df_all)
+
+
+    def _edge_conditions(self, authors=None, mentioned=None, start=None, end=None):
+        conditions, params = list(), list()
+        if authors is not None:
+            conditions.append("author IN ({})".format(','.join('?' * len(authors))))
+            params.extend(authors)
+        if mentioned is not None:
+            conditions.append("mentioned = ?")
+            params.append(mentioned.lstrip('@'))
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(pd.Timestamp(start).strftime(DATE_FORMAT))
+        if end is not None:
+            operator, bound = end_bound(end)
+            conditions.append("date {} ?".format(operator))
+            params.append(bound.strftime(DATE_FORMAT))
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+    def edges(self, authors=None, start=None, end=None):
+        """
+        Definition:
+            Reads the weighted mention graph.
+
+        Parameters:
+            - authors (list of strings): Handles whose mentions are read (None reads all of them).
+            - start, end (string or datetime): Inclusive date range of the tweets (None leaves that side open;
+              without a range, the precomputed totals are read).
+
+        Returns:
+            - Pandas DataFrame with columns ['author', 'mentioned', 'mentions', 'first_date', 'last_date'],
+              ordered by author, then most mentioned first.
+
+        """
+        if start is None and end is None:
+            table, mentions = "mention_counts", "count"
+            first_date, last_date = "first_date", "last_date"
+            group_by = ""
+        else:
+            table, mentions = "mention_edges", "COUNT(*)"
+            first_date, last_date = "MIN(date)", "MAX(date)"
+            group_by = " GROUP BY author, mentioned"
+        where, params = self._edge_conditions(authors=authors, start=start, end=end)
+        query = "SELECT author, mentioned, {} AS mentions, {} AS first_date, {} AS last_date FROM {}{}{}".format(
+            mentions, first_date, last_date, table, where, group_by)
+        query += " ORDER BY author, mentions DESC, mentioned"
+        df = pd.read_sql_query(query, self.connection, params=params)
+        for column in ('first_date', 'last_date'):
+            df[column] = pd.to_datetime(df[column])
+        return df
+
+
+    def top_mentioned(self, k=10, authors=None, start=None, end=None):
+        """
+        Definition:
+            Returns the 'k' most mentioned users, overall or by some authors, optionally within a date range.
+
+        Parameters:
+            - k (int)
+            - authors (list of strings): Only count mentions made by these handles (None counts all of them).
+            - start, end (string or datetime): Inclusive date range of the tweets (None leaves that side open).
+
+        Returns:
+            - Pandas DataFrame with columns ['mentioned', 'mentions', 'authors'] ('authors' being the number of
+              handles mentioning them), most mentioned first.
+
+        """
+        if start is None and end is None:
+            where, params = self._edge_conditions(authors=authors)
+            query = "SELECT mentioned, SUM(count) AS mentions, COUNT(*) AS authors FROM mention_counts"
+        else:
+            where, params = self._edge_conditions(authors=authors, start=start, end=end)
+            query = "SELECT mentioned, COUNT(*) AS mentions, COUNT(DISTINCT author) AS authors FROM mention_edges"
+        query += where + " GROUP BY mentioned ORDER BY mentions DESC, authors DESC, mentioned LIMIT ?"
+        return pd.read_sql_query(query, self.connection, params=params + [int(k)])
+
+
+    def mentioned_by(self, username, start=None, end=None):
+        """
+        Definition:
+            Reverse lookup: which handles mention 'username' (with or without '@'), and how often.
+
+        Parameters:
+            - username (string)
+            - start, end (string or datetime): Inclusive date range of the tweets (None leaves that side open).
+
+        Returns:
+            - Pandas DataFrame with columns ['author', 'mentions', 'first_date', 'last_date'], most mentions first.
+
+        """
+        if start is None and end is None:
+            where, params = self._edge_conditions(mentioned=username)
+            query = "SELECT author, count AS mentions, first_date, last_date FROM mention_counts" + where
+        else:
+            where, params = self._edge_conditions(mentioned=username, start=start, end=end)
+            query = "SELECT author, COUNT(*) AS mentions, MIN(date) AS first_date, MAX(date) AS last_date " \
+                    "FROM mention_edges" + where + " GROUP BY author"
+        query += " ORDER BY mentions DESC, author"
+        df = pd.read_sql_query(query, self.connection, params=params)
+        for column in ('first_date', 'last_date'):
+            df[column] = pd.to_datetime(df[column])
+        return df
+
+
+    def timeline(self, username, granularity='day', authors=None, start=None, end=None):
+        """
+        Definition:
+            Counts the mentions of 'username' per hour, day or week, to see how they change over time.
+
+        Parameters:
+            - username (string)
+            - granularity (string): One of 'hour', 'day' or 'week'.
+            - authors (list of strings): Only count mentions made by these handles (None counts all of them).
+            - start, end (string or datetime): Inclusive date range of the tweets (None leaves that side open).
+
+        Returns:
+            - Pandas DataFrame with columns ['bucket', 'mentions', 'authors'], ordered by bucket.
+
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError("granularity must be one of {}".format(GRANULARITIES))
+        where, params = self._edge_conditions(authors=authors, mentioned=username, start=start, end=end)
+        df = pd.read_sql_query("SELECT author, date FROM mention_edges" + where, self.connection, params=params)
+        buckets = bucket_start(df['date'], granularity)
+        grouped = df.groupby(buckets)
+        df_timeline = pd.DataFrame({'mentions': grouped.size(), 'authors': grouped['author'].nunique()})
+        df_timeline.index.name = 'bucket'
+        return df_timeline.reset_index()
+
+
+    def to_sparse(self, authors=None, start=None, end=None):
+        """
+        Definition:
+            Returns the mention graph as a sparse author-by-mentioned matrix of mention counts (needs 'scipy').
+
+        Parameters:
+            - authors (list of strings): Rows to include (None includes every author).
+            - start, end (string or datetime): Inclusive date range of the tweets (None leaves that side open).
+
+        Returns:
+            - Tuple of (scipy.sparse.csr_matrix, row labels (authors), column labels (mentioned users)),
+              labels being lowercased handles in alphabetical order.
+
+        """
+        from scipy import sparse
+        df = self.edges(authors=authors, start=start, end=end)
+        rows, row_labels = pd.factorize(df['author'].str.lower(), sort=True)
+        columns, column_labels = pd.factorize(df['mentioned'].str.lower(), sort=True)
+        matrix = sparse.csr_matrix((df['mentions'].to_numpy(dtype=np.int64), (rows, columns)),
+                                   shape=(len(row_labels), len(column_labels)))
+        return matrix, list(row_labels), list(column_labels)
@@ -0,0 +1,163 @@
+# Persistent, content-addressed sentiment cache
+import hashlib
+import os
+import sqlite3
+import time
+
+
+
+class SentimentCache():
+    """
+    On-disk cache of sentiment scores shared across runs (and processes).
+    Entries are keyed by a hash of the cleaned tweet text plus the analyzer version, so
+    changing the scoring logic (or TextBlob version) never serves stale scores.
+    Eviction is first in, first out (by insertion time, not last use), so lookups never write.
+    """
+    def __init__(self, db_filename, analyzer_version, max_entries=1000000, batch_size=500, timeout=30):
+        """
+        Parameters:
+            - db_filename (string): Path to the SQLite file (created if missing).
+            - analyzer_version (string): Version tag of the scoring logic; part of every key.
+            - max_entries (int): The first inserted entries are evicted once the cache grows beyond this size.
+            - batch_size (int): Number of keys looked up / inserted per SQL statement.
+            - timeout (int): Seconds to wait on a lock held by another process.
+        """
+        self.db_filename = db_filename
+        self.analyzer_version = analyzer_version
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._connection_pid = None
+        # Running estimate of the number of entries, so inserts do not count the whole table.
+        # Other processes' inserts are only seen when the table is counted again (in 'evict').
+        self._size = None
+
+
+    def _connect(self):
+        # SQLite connections must not be shared with forked child processes.
+        if self._connection is None or self._connection_pid != os.getpid():
+            # One thread at a time, but not necessarily the one that opened the connection.
+            connection = sqlite3.connect(self.db_filename, timeout=self.timeout, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS sentiment_cache (
+                    key TEXT PRIMARY KEY,
+                    polarity REAL NOT NULL,
+                    subjectivity REAL NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_sentiment_cache_created_at ON sentiment_cache (created_at)")
+            connection.commit()
+            self._connection = connection
+            self._connection_pid = os.getpid()
+            self._size = None
+        return self._connection
+
+
+    def make_key(self, cleaned_text):
+        """
+        Returns hex digest identifying 'cleaned_text' for the current analyzer version.
+        """
+        content = "{}\0{}".format(self.analyzer_version, cleaned_text).encode('utf-8')
+        return hashlib.sha1(content).hexdigest()
+
+
+    def get_many(self, cleaned_texts):
+        """
+        Definition:
+            Looks up the scores of several cleaned texts at once.
+
+        Parameters:
+            - cleaned_texts (iterable of strings)
+
+        Returns:
+            - Dictionary mapping each cached text to its (polarity, subjectivity) tuple.
+              Texts that are not cached are left out.
+
+        """
+        keys_to_texts = {self.make_key(text): text for text in set(cleaned_texts)}
+        keys = list(keys_to_texts.keys())
+        connection = self._connect()
+        found = dict()
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            query = "SELECT key, polarity, subjectivity FROM sentiment_cache WHERE key IN ({})".format(
+                ','.join('?' * len(batch)))
+            for key, polarity, subjectivity in connection.execute(query, batch):
+                found[keys_to_texts[key]] = (polarity, subjectivity)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+
+    def put_many(self, scores):
+        """
+        Bulk-inserts a dictionary mapping cleaned texts to (polarity, subjectivity) tuples.
+        Entries already written (possibly by another process) are left untouched.
+        """
+        if not scores:
+            return
+        now = time.time()
+        rows = [(self.make_key(text), polarity, subjectivity, now) for text, (polarity, subjectivity) in scores.items()]
+        connection = self._connect()
+        if self._size is None:
+            self._size = len(self)
+        changes_before = connection.total_changes
+        with connection:
+            for start in range(0, len(rows), self.batch_size):
+                connection.executemany(
+                    "INSERT OR IGNORE INTO sentiment_cache (key, polarity, subjectivity, created_at) VALUES (?, ?, ?, ?)",
+                    rows[start:start + self.batch_size])
+        # Ignored rows (already cached) do not count as changes.
+        self._size += connection.total_changes - changes_before
+        if self._size > self.max_entries:
+            self.evict()
+
+
+    def evict(self):
+        """
+        Deletes the first inserted entries while the cache holds more than 'max_entries' entries.
+        Counts the whole table: called by 'put_many' only once the running estimate exceeds 'max_entries', and on 'close'.
+        """
+        connection = self._connect()
+        self._size = len(self)
+        excess = self._size - self.max_entries
+        if excess > 0:
+            with connection:
+                connection.execute("""
+                    DELETE FROM sentiment_cache WHERE key IN (
+                        SELECT key FROM sentiment_cache ORDER BY created_at LIMIT ?
+                    )
+                """, (excess,))
+            self._size = self.max_entries
+
+
+    def stats(self):
+        """
+        Returns dictionary of hit/miss counters (for this process) and current size of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'entries': len(self)
+        }
+
+
+    def close(self):
+        if self._connection is not None and self._connection_pid == os.getpid():
+            # Catches up on entries added by other processes since the last count.
+            self.evict()
+            self._connection.close()
+        self._connection = None
+        self._connection_pid = None
+
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0]
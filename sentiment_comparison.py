@@ -1,6 +1,11 @@
 # Twitter, API and NLP related modules
 import tweet_analysis
-from twitter_handles import usernames, number_of_tweets
+from sentiment_cache import SentimentCache
+from twitter_handles import usernames, number_of_tweets, sentiment_workers, fetch_workers, offline_comparison, \
+    results_backend
+from fetch_scheduler import TimelineFetchScheduler
+from tweet_store import TweetStore, SQLiteTweetStore
+from sentiment_rollups import SentimentRollupIndex
 
 # Data manipulation, analysis and visualization
 import numpy as np
@@ -8,60 +13,99 @@ import pandas as pd
 import matplotlib.pyplot as plt
 
 
-def get_users_tweets(usernames, number_of_tweets):
+def get_users_tweets(api, tweet_analyzer, usernames, number_of_tweets, results_path):
     """
-    Takes in list of 'usernames' and integer of 'number_of_tweets'.
-    Returns Pandas DataFrame containing tweet details for those users, and creates CSV file of the same.
+    Takes in an authenticated tweepy 'api', a 'TweetAnalyzer', list of 'usernames' and integer of 'number_of_tweets'.
+    Returns Pandas DataFrame containing tweet details for those users, and creates CSV file of the same in 'results_path'.
     Details include columns labelled:
     ['username', 'tweet_corpus', 'avg_post_length', 'likes_per_post', 'rts_per_post', 'avg_polarity', 'avg_subjectivity']
     """
-    df_tweet_info = pd.DataFrame()
-    for username in usernames:
+    user_rows = list()
+    fetch_scheduler = TimelineFetchScheduler(api, max_workers=fetch_workers)
+    for username, tweets, error in fetch_scheduler.fetch_timelines(usernames, number_of_tweets):
         try:
-            tweets = api.user_timeline(screen_name=username, count=number_of_tweets)
+            if error is not None:
+                raise error
 
             df = tweet_analyzer.tweets_to_data_frame(tweets)
-            df_tweets_original = df[df['tweets'].apply(tweet_analyzer.drop_retweets)]
+            df_tweets_original = tweet_analyzer.get_original_tweets(df)
 
             sentences = list(df_tweets_original['tweets'])
             corpus = '. '.join(sentences)
-            avg_polarity = tweet_analyzer.analyze_polarity(corpus)
-            avg_subjectivity = tweet_analyzer.analyze_subjectivity(corpus)
-            avg_post_length = round(df_tweets_original['len'].mean(), 2)
-            likes_per_post = round(df_tweets_original['likes'].mean(), 2)
-            rts_per_post = round(df_tweets_original['retweets'].mean(), 2)
-            df_temp = pd.DataFrame({
+            avg_polarity, avg_subjectivity = tweet_analyzer.analyze_sentiment_batch([corpus])
+            user_rows.append({
                 'username': username,
                 'tweet_corpus': corpus,
-                'avg_post_length': avg_post_length,
-                'likes_per_post': likes_per_post,
-                'rts_per_post': rts_per_post,
-                'avg_polarity': avg_polarity,
-                'avg_subjectivity': avg_subjectivity
-            }, index=[0])
-            df_tweet_info = pd.concat([df_tweet_info, df_temp], ignore_index=True, sort=False)
+                'avg_post_length': round(df_tweets_original['len'].mean(), 2),
+                'likes_per_post': round(df_tweets_original['likes'].mean(), 2),
+                'rts_per_post': round(df_tweets_original['retweets'].mean(), 2),
+                'avg_polarity': avg_polarity[0],
+                'avg_subjectivity': avg_subjectivity[0]
+            })
             print("Extracted tweets for user: @{}".format(username))
         except Exception as e:
             print("ERROR ({}) - Either username is wrong OR page not found - Handle: @{}".format(e, username))
     
+    cols = ['username', 'tweet_corpus', 'likes_per_post', 'rts_per_post', 'avg_polarity', 'avg_subjectivity', 'avg_post_length']
+    df_tweet_info = rank_users(pd.DataFrame(user_rows, columns=cols))
+    df_tweet_info.to_csv("{}/Tweet comparisons (Last {} tweets).csv".format(results_path, number_of_tweets), index=False)
+    return df_tweet_info
+
+
+def get_users_stats_from_store(tweet_store, rollup_index, usernames, results_path):
+    """
+    Offline version of 'get_users_tweets': reads the original-tweet rollups kept by 'tweet_analysis.py'
+    (one row per handle), without calling the Twitter API or scoring anything.
+    Handles stored without rollups (Eg: imported results) get them rebuilt from 'tweet_store' first.
+    Returns Pandas DataFrame with the columns of 'get_users_tweets' except 'tweet_corpus', and creates CSV file of the same.
+    Averages are means of per-tweet scores, rather than the score of all tweets joined into one corpus.
+    """
+    for username in usernames:
+        if not rollup_index.has_handle(username):
+            df = tweet_store.load(username)
+            if df is not None and not df.empty:
+                rollup_index.rebuild(username, df)
+    df_summary = rollup_index.summary(usernames, originals_only=True)
+    # Handles without original tweets have no means to compare; they are reported as missing below.
+    df_summary = df_summary[df_summary['count'] > 0]
+    df_tweet_info = pd.DataFrame({
+        'username': df_summary['handle'],
+        'likes_per_post': df_summary['likes'] / df_summary['count'],
+        'rts_per_post': df_summary['retweets'] / df_summary['count'],
+        'avg_polarity': df_summary['polarity_mean'],
+        'avg_subjectivity': df_summary['subjectivity_mean'],
+        'avg_post_length': df_summary['len_mean']
+    }).round(2)
+
+    missing_usernames = sorted(set(usernames) - set(df_tweet_info['username']))
+    if missing_usernames:
+        print("No stored tweets for: {}".format(', '.join('@' + username for username in missing_usernames)))
+
+    df_tweet_info = rank_users(df_tweet_info)
+    df_tweet_info.to_csv("{}/Tweet comparisons (Stored tweets).csv".format(results_path), index=False)
+    return df_tweet_info
+
+
+def rank_users(df_tweet_info):
+    """
+    Sorts users by engagement first, then by sentiment and post length.
+    """
     ranking_metric = ['likes_per_post', 'rts_per_post', 'avg_polarity', 'avg_subjectivity', 'avg_post_length']
     lower_the_better = [False, False, False, True, True]
-    df_tweet_info.sort_values(by=ranking_metric, ascending=lower_the_better, inplace=True)
+    df_tweet_info = df_tweet_info.sort_values(by=ranking_metric, ascending=lower_the_better)
     df_tweet_info.reset_index(drop=True, inplace=True)
-    cols = ['username', 'tweet_corpus', 'likes_per_post', 'rts_per_post', 'avg_polarity', 'avg_subjectivity', 'avg_post_length']
-    df_tweet_info = df_tweet_info.loc[:, cols]
-    df_tweet_info.to_csv("{}/Tweet comparisons (Last {} tweets).csv".format(results_path, number_of_tweets), index=False)
     return df_tweet_info
 
 
-def plot_likes_rts(df, color='purple', tight_layout=False):
+def plot_likes_rts(df, label, results_path, color='purple', tight_layout=False):
     """
     Creates scatter plot for Likes-Retweets comparisons between various users.
+    'label' (Eg: 'Last 200 tweets') describes the tweets compared, in the title and file name.
     """
     plt.style.use('classic') # ['classic', fivethirtyeight', 'seaborn-dark', 'seaborn-ticks', 'ggplot']
     plt.figure(figsize=(25, 14))
     plt.scatter(x=df['likes_per_post'], y=df['rts_per_post'], s=180, color=color)
-    plt.title("Twitter - Likes and Retweets (Last {} tweets)".format(number_of_tweets), fontsize=40)
+    plt.title("Twitter - Likes and Retweets ({})".format(label), fontsize=40)
     plt.xlabel("Likes per post", fontsize=30)
     plt.ylabel("RTs per post", fontsize=30)
     plt.xticks(fontsize=20)
@@ -73,17 +117,19 @@ def plot_likes_rts(df, color='purple', tight_layout=False):
     if(tight_layout == True):
         plt.tight_layout()
     plt.grid()
-    plt.savefig("{}/Likes and Retweets (Last {} tweets).png".format(results_path, number_of_tweets))
+    plt.savefig("{}/Likes and Retweets ({}).png".format(results_path, label))
+    plt.close()
 
 
-def plot_sentiment(df, color='green', tight_layout=False):
+def plot_sentiment(df, label, results_path, color='green', tight_layout=False):
     """
     Creates scatter plot for sentiment comparisons (polarity and subjectivity) between various users.
+    'label' describes the tweets compared (see 'plot_likes_rts').
     """
     plt.style.use('classic') # ['classic', fivethirtyeight', 'seaborn-dark', 'seaborn-ticks', 'ggplot']
     plt.figure(figsize=(25, 14))
     plt.scatter(x=df['avg_subjectivity'], y=df['avg_polarity'], s=180, color=color)
-    plt.title("Tweet sentiment (Last {} tweets)".format(number_of_tweets), fontsize=40)
+    plt.title("Tweet sentiment ({})".format(label), fontsize=40)
     plt.xlabel("Average subjectivity", fontsize=30)
     plt.ylabel("Average polarity", fontsize=30)
     plt.xticks(np.arange(0, 1+0.25, 0.25), fontsize=20)
@@ -95,19 +141,21 @@ def plot_sentiment(df, color='green', tight_layout=False):
     if(tight_layout == True):
         plt.tight_layout()
     plt.grid()
-    plt.savefig("{}/Sentiment scores (Last {} tweets).png".format(results_path, number_of_tweets))
+    plt.savefig("{}/Sentiment scores ({}).png".format(results_path, label))
+    plt.close()
 
 
-def plot_tweet_length(df, color='#1DC34E', tight_layout=False):
+def plot_tweet_length(df, label, results_path, color='#1DC34E', tight_layout=False):
     """
     Creates horizontal bar chart for average character count per post, between various users.
+    'label' describes the tweets compared (see 'plot_likes_rts').
     """
     df.sort_values(by='avg_post_length', ascending=True, inplace=True)
 
     plt.style.use('classic') # ['classic', fivethirtyeight', 'seaborn-dark', 'seaborn-ticks', 'ggplot']
     plt.figure(figsize=(25, 14))
     plt.barh(y=df['username'], width=df['avg_post_length'], color=color)
-    plt.title("Tweet length (Last {} tweets)".format(number_of_tweets), fontsize=40)
+    plt.title("Tweet length ({})".format(label), fontsize=40)
     plt.xlabel("Average tweet length (characters)", fontsize=30)
     plt.ylabel("Usernames", fontsize=30)
     plt.xticks(fontsize=20)
@@ -118,18 +166,64 @@ def plot_tweet_length(df, color='#1DC34E', tight_layout=False):
     if(tight_layout == True):
         plt.tight_layout()
     plt.grid()
-    plt.savefig("{}/Tweet length (Last {} tweets).png".format(results_path, number_of_tweets))
+    plt.savefig("{}/Tweet length ({}).png".format(results_path, label))
+    plt.close()
+
+
+
+def compare_users(usernames, offline=offline_comparison, results_path="./insights_compared"):
+    """
+    Definition:
+        Compares 'usernames' (likes, retweets, sentiment and tweet length), and saves the
+        comparison CSV and plots into 'results_path'.
+
+    Parameters:
+        - usernames (list of strings)
+        - offline (bool): Compare the tweets stored by 'tweet_analysis.py' instead of fetching 'number_of_tweets' per user.
+        - results_path (string)
+
+    Returns:
+        - Pandas DataFrame of the comparison (empty, and no plots are saved, if no user has tweets to compare).
+
+    """
+    if offline:
+        # Compares the tweets stored by 'tweet_analysis.py'; no credentials or API calls needed.
+        label = "Stored tweets"
+        if results_backend == 'sqlite':
+            tweet_store = SQLiteTweetStore(tweet_analysis.RESULTS_DB_FILENAME)
+        else:
+            tweet_store = TweetStore("./results")
+        rollup_index = SentimentRollupIndex(tweet_analysis.RESULTS_DB_FILENAME)
+        try:
+            df_info = get_users_stats_from_store(tweet_store, rollup_index, usernames, results_path)
+        finally:
+            rollup_index.close()
+            if hasattr(tweet_store, 'close'):
+                tweet_store.close()
+    else:
+        from twitter_client import TwitterClient
+        label = "Last {} tweets".format(number_of_tweets)
+        api = TwitterClient().get_twitter_client_api()
+        sentiment_cache = SentimentCache(tweet_analysis.SENTIMENT_CACHE_FILENAME, tweet_analysis.SENTIMENT_ANALYZER_VERSION)
+        tweet_analyzer = tweet_analysis.TweetAnalyzer(sentiment_cache=sentiment_cache, n_workers=sentiment_workers)
+        try:
+            df_info = get_users_tweets(api, tweet_analyzer, usernames, number_of_tweets, results_path)
+        finally:
+            tweet_analyzer.close()
+            sentiment_cache.close()
+
+    if df_info.empty:
+        # Nothing to plot (the axis limits would be NaN); the missing handles were reported above.
+        print("No tweets to compare for: {}".format(', '.join('@' + username for username in usernames)))
+        return df_info
+    plot_likes_rts(df=df_info, label=label, results_path=results_path, color='purple', tight_layout=False)
+    plot_sentiment(df=df_info, label=label, results_path=results_path, color='green', tight_layout=False)
+    plot_tweet_length(df=df_info, label=label, results_path=results_path, color='#1DC34E', tight_layout=False)
+    return df_info
+
 
 
 
 if __name__ == '__main__':
-    twitter_client = tweet_analysis.TwitterClient()
-    tweet_analyzer = tweet_analysis.TweetAnalyzer()
-    api = twitter_client.get_twitter_client_api()
-
-    results_path = "./insights_compared"
-    df_info = get_users_tweets(usernames, number_of_tweets)
-    plot_likes_rts(df=df_info, color='purple', tight_layout=False)
-    plot_sentiment(df=df_info, color='green', tight_layout=False)
-    plot_tweet_length(df=df_info, color='#1DC34E', tight_layout=False)
-    print("Done.")
\ No newline at end of file
+    compare_users(usernames)
+    print("Done.")
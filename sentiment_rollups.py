@@ -0,0 +1,194 @@
+# Precomputed time-bucket sentiment rollups
+import sqlite3
+import pandas as pd
+import text_processing
+from tweet_store import end_bound
+
+GRANULARITIES = ('hour', 'day', 'week')
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Columns summed per bucket; means and variances are derived from them at query time.
+SUM_COLUMNS = ['count', 'polarity_sum', 'polarity_sumsq', 'subjectivity_sum', 'subjectivity_sumsq', 'likes_sum', 'retweets_sum',
+               'len_sum']
+
+
+
+def bucket_start(dates, granularity):
+    """
+    Returns Pandas Series with the start of the hour, day or week (Monday) each date falls in.
+    """
+    dates = pd.to_datetime(dates)
+    if granularity == 'hour':
+        return dates.dt.floor('h')
+    if granularity == 'day':
+        return dates.dt.normalize()
+    if granularity == 'week':
+        return dates.dt.normalize() - pd.to_timedelta(dates.dt.dayofweek, unit='D')
+    raise ValueError("granularity must be one of {}".format(GRANULARITIES))
+
+
+
+class SentimentRollupIndex():
+    """
+    Per-handle hourly, daily and weekly aggregates of sentiment and engagement, kept in SQLite.
+    Buckets store sums (count, sum and sum of squares of the scores, likes, retweets and tweet lengths), so they
+    can be updated incrementally with newly analyzed tweets, and merged into coarser ranges at query time.
+    Every bucket is kept twice: for all tweets, and for original tweets only (Eg: for 'sentiment_comparison.py').
+    """
+    def __init__(self, db_filename, timeout=30):
+        self.db_filename = db_filename
+        # Not tied to the creating thread: 'AsyncTweetPipeline' uses it from its database thread.
+        self.connection = sqlite3.connect(db_filename, timeout=timeout, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(sentiment_rollups)")]
+        if columns and 'originals' not in columns:
+            # Rollups from before originals were kept apart; the pipeline rebuilds them from the stored tweets.
+            with self.connection:
+                self.connection.execute("DROP TABLE sentiment_rollups")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS sentiment_rollups (
+                handle TEXT NOT NULL,
+                originals INTEGER NOT NULL,
+                granularity TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                polarity_sum REAL NOT NULL,
+                polarity_sumsq REAL NOT NULL,
+                subjectivity_sum REAL NOT NULL,
+                subjectivity_sumsq REAL NOT NULL,
+                likes_sum INTEGER NOT NULL,
+                retweets_sum INTEGER NOT NULL,
+                len_sum INTEGER NOT NULL,
+                PRIMARY KEY (handle, originals, granularity, bucket)
+            )
+        """)
+        self.connection.commit()
+
+
+    def close(self):
+        self.connection.close()
+
+
+    def handles(self):
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT handle FROM sentiment_rollups ORDER BY handle")]
+
+
+    def has_handle(self, username):
+        return self.connection.execute("SELECT 1 FROM sentiment_rollups WHERE handle = ? LIMIT 1", (username,)).fetchone() is not None
+
+
+    def update(self, username, df_new):
+        """
+        Definition:
+            Adds newly analyzed tweets to the rollups of 'username'.
+            Only pass tweets that were not added before (Eg: 'df_added' from 'TweetStore.merge').
+
+        Parameters:
+            - username (string)
+            - df_new (Pandas DataFrame): With columns 'tweets', 'len', 'date', 'polarity', 'subjectivity', 'likes'
+              and 'retweets'.
+
+        """
+        if df_new.empty:
+            return
+        df_values = pd.DataFrame({
+            'polarity_sum': df_new['polarity'].astype(float).to_numpy(),
+            'polarity_sumsq': df_new['polarity'].astype(float).to_numpy() ** 2,
+            'subjectivity_sum': df_new['subjectivity'].astype(float).to_numpy(),
+            'subjectivity_sumsq': df_new['subjectivity'].astype(float).to_numpy() ** 2,
+            'likes_sum': df_new['likes'].astype('int64').to_numpy(),
+            'retweets_sum': df_new['retweets'].astype('int64').to_numpy(),
+            'len_sum': df_new['len'].astype('int64').to_numpy()
+        })
+        dates = pd.to_datetime(df_new['date']).reset_index(drop=True)
+        is_original = ~text_processing.is_retweet(df_new['tweets']).to_numpy()
+        rows = list()
+        for granularity in GRANULARITIES:
+            buckets = bucket_start(dates, granularity).dt.strftime(DATE_FORMAT)
+            for originals, df_scope, scope_buckets in ((0, df_values, buckets),
+                                                       (1, df_values[is_original], buckets[is_original])):
+                grouped = df_scope.groupby(scope_buckets)
+                df_buckets = grouped.sum()
+                df_buckets.insert(0, 'count', grouped.size())
+                for bucket, values in zip(df_buckets.index, df_buckets[SUM_COLUMNS].itertuples(index=False)):
+                    count, polarity_sum, polarity_sumsq, subjectivity_sum, subjectivity_sumsq, likes_sum, retweets_sum, len_sum = values
+                    rows.append((username, originals, granularity, bucket, int(count), float(polarity_sum), float(polarity_sumsq),
+                                 float(subjectivity_sum), float(subjectivity_sumsq), int(likes_sum), int(retweets_sum), int(len_sum)))
+        with self.connection:
+            self.connection.executemany("""
+                INSERT INTO sentiment_rollups (handle, originals, granularity, bucket, {})
+                VALUES (?, ?, ?, ?, {})
+                ON CONFLICT (handle, originals, granularity, bucket) DO UPDATE SET {}
+            """.format(', '.join(SUM_COLUMNS), ', '.join('?' * len(SUM_COLUMNS)),
+                       ', '.join('{0} = {0} + excluded.{0}'.format(column) for column in SUM_COLUMNS)), rows)
+
+
+    def rebuild(self, username, df_all):
+        """
+        Replaces the rollups of 'username' with aggregates of 'df_all' (every stored tweet of that handle).
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM sentiment_rollups WHERE handle = ?", (username,))
+        self.update(username, df_all)
+
+
+    def query(self, usernames, granularity='day', start=None, end=None, originals_only=False):
+        """
+        Definition:
+            Reads the rollups of one or more handles.
+
+        Parameters:
+            - usernames (string or list of strings)
+            - granularity (string): One of 'hour', 'day' or 'week'.
+            - start, end (string or datetime): Inclusive range of bucket starts (None leaves that side open); an 'end'
+              without a time includes that whole day (see 'tweet_store.end_bound').
+            - originals_only (bool): Aggregate only original tweets, leaving retweets out.
+
+        Returns:
+            - Pandas DataFrame with columns ['handle', 'bucket', 'count', 'polarity_mean', 'polarity_var',
+              'subjectivity_mean', 'subjectivity_var', 'likes', 'retweets', 'len_mean'], ordered by handle and bucket.
+
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError("granularity must be one of {}".format(GRANULARITIES))
+        if isinstance(usernames, str):
+            usernames = [usernames]
+        query = "SELECT handle, bucket, {} FROM sentiment_rollups WHERE originals = ? AND granularity = ? AND handle IN ({})".format(
+            ', '.join(SUM_COLUMNS), ','.join('?' * len(usernames)))
+        params = [int(originals_only), granularity] + list(usernames)
+        if start is not None:
+            query += " AND bucket >= ?"
+            params.append(pd.Timestamp(start).strftime(DATE_FORMAT))
+        if end is not None:
+            operator, bound = end_bound(end)
+            query += " AND bucket {} ?".format(operator)
+            params.append(bound.strftime(DATE_FORMAT))
+        query += " ORDER BY handle, bucket"
+        df_sums = pd.read_sql_query(query, self.connection, params=params)
+        df_sums['bucket'] = pd.to_datetime(df_sums['bucket'])
+        return self._sums_to_stats(df_sums, ['handle', 'bucket'])
+
+
+    def summary(self, usernames, originals_only=False):
+        """
+        Returns Pandas DataFrame of whole-history statistics per handle (one row per handle),
+        with the same columns as 'query' minus 'bucket'. Handles without rollups are left out.
+        """
+        query = "SELECT handle, {} FROM sentiment_rollups WHERE originals = ? AND granularity = 'week' AND handle IN ({}) GROUP BY handle ORDER BY handle".format(
+            ', '.join('SUM({0}) AS {0}'.format(column) for column in SUM_COLUMNS), ','.join('?' * len(usernames)))
+        df_sums = pd.read_sql_query(query, self.connection, params=[int(originals_only)] + list(usernames))
+        return self._sums_to_stats(df_sums, ['handle'])
+
+
+    def _sums_to_stats(self, df_sums, key_columns):
+        count = df_sums['count'].astype(float)
+        df_stats = df_sums[key_columns].copy()
+        df_stats['count'] = df_sums['count'].astype('int64')
+        for score in ('polarity', 'subjectivity'):
+            mean = df_sums[score + '_sum'] / count
+            df_stats[score + '_mean'] = mean
+            # Population variance; clipped at 0 against floating point error.
+            df_stats[score + '_var'] = (df_sums[score + '_sumsq'] / count - mean ** 2).clip(lower=0)
+        df_stats['likes'] = df_sums['likes_sum'].astype('int64')
+        df_stats['retweets'] = df_sums['retweets_sum'].astype('int64')
+        df_stats['len_mean'] = df_sums['len_sum'] / count
+        return df_stats
@@ -0,0 +1,210 @@
+# Buffered, rotating writer for streamed tweets
+import gzip
+import os
+import shutil
+import threading
+import time
+
+
+
+class BufferedTweetWriter():
+    """
+    Appends streamed tweets to a file in batches from a background thread, so the
+    stream listener never waits on disk I/O. Optionally rotates the output file by
+    size and/or age, and gzips the rotated segments.
+    If a background flush fails (Eg: disk full), its tweets go back to the buffer and are retried on the
+    next flush; the error is raised by the next 'write' or 'close'. While flushes keep failing, tweets
+    beyond 'max_pending' are dropped (and counted) rather than buffered without bound.
+    """
+    def __init__(self, filename, flush_interval=1.0, max_buffered=1000,
+                 rotate_bytes=None, rotate_seconds=None, compress_rotated=False, max_pending=100000):
+        """
+        Parameters:
+            - filename (string): File the current segment is appended to.
+            - flush_interval (float): Seconds between periodic flushes.
+            - max_buffered (int): Number of buffered tweets that triggers an early flush.
+            - rotate_bytes (int): Rotate once the current segment reaches this size (None disables).
+            - rotate_seconds (float): Rotate once the current segment is this old (None disables).
+            - compress_rotated (bool): Gzip segments once they are rotated out.
+            - max_pending (int): Most tweets held in memory while flushes fail; newer ones are dropped.
+        """
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress_rotated = compress_rotated
+        self.max_pending = max_pending
+
+        self.received = 0
+        self.written = 0
+        self.bytes_written = 0
+        self.flushes = 0
+        self.rotations = 0
+        self.flush_errors = 0
+        self.dropped = 0
+        self.started_at = time.time()
+
+        self._buffer = list()
+        self._oldest_buffered_at = None
+        self._condition = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._closed = False
+        self._error = None
+        self._failing = False
+        self._file = None
+        self._segment_started_at = None
+        self._flusher = threading.Thread(target=self._run, name='BufferedTweetWriter', daemon=True)
+        self._flusher.start()
+
+
+    def write(self, data):
+        """
+        Buffers one tweet (raw JSON string); never blocks on disk I/O.
+        Raises the error of a failed background flush once, after buffering the tweet.
+        """
+        if not data.endswith('\n'):
+            data += '\n'
+        with self._condition:
+            if self._closed:
+                raise ValueError("write to closed BufferedTweetWriter")
+            self.received += 1
+            if len(self._buffer) >= self.max_pending:
+                self.dropped += 1
+            else:
+                if not self._buffer:
+                    self._oldest_buffered_at = time.time()
+                self._buffer.append(data)
+                # While flushes fail, retries wait for 'flush_interval' rather than for every new tweet.
+                if len(self._buffer) >= self.max_buffered and not self._failing:
+                    self._condition.notify()
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # After a failure, wait before retrying even if the buffer is full.
+                if not self._closed and (self._failing or len(self._buffer) < self.max_buffered):
+                    self._condition.wait(self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                with self._condition:
+                    self._failing = True
+                    self.flush_errors += 1
+                    self._error = e
+            else:
+                with self._condition:
+                    self._failing = False
+
+
+    def flush(self):
+        """
+        Writes every buffered tweet to the current segment, rotating it first if due.
+        """
+        with self._condition:
+            batch, self._buffer = self._buffer, list()
+            batch_buffered_at, self._oldest_buffered_at = self._oldest_buffered_at, None
+        try:
+            with self._io_lock:
+                if self._rotation_due():
+                    self._rotate()
+                if not batch:
+                    return
+                if self._file is None:
+                    self._file = open(self.filename, 'a')
+                    self._segment_started_at = time.time()
+                chunk = ''.join(batch)
+                self._file.write(chunk)
+                self._file.flush()
+                self.written += len(batch)
+                self.bytes_written += len(chunk)
+                self.flushes += 1
+        except Exception:
+            # Puts the batch back in front of tweets buffered meanwhile, for the next flush to retry.
+            with self._condition:
+                buffer = batch + self._buffer
+                self.dropped += max(0, len(buffer) - self.max_pending)
+                self._buffer = buffer[:self.max_pending]
+                if batch_buffered_at is not None:
+                    self._oldest_buffered_at = batch_buffered_at
+            raise
+
+
+    def _rotation_due(self):
+        if self._file is None:
+            return False
+        if self.rotate_bytes is not None and self._file.tell() >= self.rotate_bytes:
+            return True
+        if self.rotate_seconds is not None and time.time() - self._segment_started_at >= self.rotate_seconds:
+            return True
+        return False
+
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        base, extension = os.path.splitext(self.filename)
+        rotated_filename = "{}.{}{}".format(base, time.strftime('%Y%m%d-%H%M%S'), extension)
+        suffix = 1
+        while os.path.exists(rotated_filename) or os.path.exists(rotated_filename + '.gz'):
+            rotated_filename = "{}.{}-{}{}".format(base, time.strftime('%Y%m%d-%H%M%S'), suffix, extension)
+            suffix += 1
+        os.rename(self.filename, rotated_filename)
+        if self.compress_rotated:
+            with open(rotated_filename, 'rb') as source, gzip.open(rotated_filename + '.gz', 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.remove(rotated_filename)
+        self.rotations += 1
+
+
+    def close(self):
+        """
+        Stops the background thread and flushes whatever is still buffered.
+        Raises the error of the final flush, or else of an earlier background flush not yet raised by 'write'.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._flusher.join()
+        try:
+            self.flush()
+        finally:
+            with self._io_lock:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+        with self._condition:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+
+    def stats(self):
+        """
+        Returns dictionary of throughput and lag counters.
+        """
+        with self._condition:
+            buffered = len(self._buffer)
+            oldest_buffered_at = self._oldest_buffered_at
+        now = time.time()
+        elapsed = max(now - self.started_at, 1e-9)
+        return {
+            'received': self.received,
+            'written': self.written,
+            'buffered': buffered,
+            'bytes_written': self.bytes_written,
+            'flushes': self.flushes,
+            'rotations': self.rotations,
+            'flush_errors': self.flush_errors,
+            'dropped': self.dropped,
+            'tweets_per_second': round(self.received / elapsed, 2),
+            'lag_seconds': round(now - oldest_buffered_at, 3) if oldest_buffered_at else 0.0
+        }
@@ -0,0 +1,164 @@
+# Synthetic tweets, for benchmarking without the Twitter API
+import datetime
+import json
+import numpy as np
+from fake_twitter_api import FakeStatus
+
+# Proportions measured on the tweets stored in 'results' (896 tweets of the default handles).
+RETWEET_RATIO = 0.21
+MENTION_RATIO = 0.75
+URL_RATIO = 0.5
+HASHTAG_RATIO = 0.1
+MEAN_WORDS = 14
+MAX_TWEET_LENGTH = 140
+URL_CHARACTERS = np.array(list('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'))
+SOURCES = {
+    'Twitter for iPhone': 0.49,
+    'Twitter for Android': 0.41,
+    'Twitter Web App': 0.07,
+    'TweetDeck': 0.02,
+    'Twitter Web Client': 0.01
+}
+
+# Common words first (sampled with Zipf-like weights), with enough opinion words for TextBlob to score.
+VOCABULARY = """
+    the to a and of in is for that on it you this with be at are have was not but so from we they just
+    will my all about what can out more one if like when get who now your our their up time no by how
+    game team season goal match league player club players win first last new back today week year
+    going good great best better bad worst amazing brilliant terrible poor strong weak happy sad
+    really very never always still right wrong big little long short old young top final home away
+    fans coach transfer deal contract window price model phone update law draw draft news
+    love hate hope think know want need see watch play played playing scored scores beat lost won
+    awful excellent fantastic horrible nice lovely fine decent crazy incredible disappointing
+    impressive boring exciting perfect easy hard free simple important interesting funny sorry
+""".split()
+
+HANDLES = [
+    'OptaJoe', 'BBCSport', 'SkySportsNews', 'FabrizioRomano', 'premierleague', 'ChampionsLeague',
+    'anika_gupta', 'tech4luddites', 'slotterdotter', 'sidlowe', 'honigstein', 'FantasyScout1'
+]
+
+
+
+class SyntheticTweetGenerator():
+    """
+    Generates tweets resembling the stored ones: similar length, mention, URL, hashtag and retweet
+    rates, sources and heavy-tailed likes / retweets. Output is deterministic for a given 'seed'.
+    """
+    def __init__(self, seed=0, retweet_ratio=RETWEET_RATIO, mention_ratio=MENTION_RATIO, url_ratio=URL_RATIO,
+                 hashtag_ratio=HASHTAG_RATIO, mean_words=MEAN_WORDS, handles=None):
+        self.random = np.random.RandomState(seed)
+        self.retweet_ratio = retweet_ratio
+        self.mention_ratio = mention_ratio
+        self.url_ratio = url_ratio
+        self.hashtag_ratio = hashtag_ratio
+        self.mean_words = mean_words
+        self.handles = list(handles or HANDLES)
+        weights = 1.0 / np.arange(1, len(VOCABULARY) + 1)
+        self._word_weights = weights / weights.sum()
+        self._sources = list(SOURCES)
+        self._source_weights = np.array(list(SOURCES.values())) / sum(SOURCES.values())
+
+
+    def texts(self, n):
+        """
+        Returns list of 'n' tweet texts.
+        """
+        random = self.random
+        word_counts = np.clip(random.poisson(self.mean_words, n), 2, None)
+        words = random.choice(len(VOCABULARY), size=int(word_counts.sum()), p=self._word_weights)
+        retweets = random.random_sample(n) < self.retweet_ratio
+        mentions = random.random_sample(n) < self.mention_ratio
+        urls = random.random_sample(n) < self.url_ratio
+        hashtags = random.random_sample(n) < self.hashtag_ratio
+        url_paths = URL_CHARACTERS[random.randint(len(URL_CHARACTERS), size=(n, 10))].view('<U10').ravel()
+
+        texts = list()
+        start = 0
+        for i in range(n):
+            tokens = [VOCABULARY[word] for word in words[start:start + word_counts[i]]]
+            start += word_counts[i]
+            tokens[0] = tokens[0].capitalize()
+            if hashtags[i]:
+                tokens.append('#' + VOCABULARY[random.randint(len(VOCABULARY))])
+            if mentions[i]:
+                tokens = ['@' + handle for handle in random.choice(self.handles, random.randint(1, 3), replace=False)] + tokens
+            text = ' '.join(tokens)
+            if retweets[i]:
+                text = "RT @{}: {}".format(self.handles[random.randint(len(self.handles))], text)
+            if urls[i]:
+                url = "https://t.co/" + url_paths[i]
+                if len(text) + len(url) + 1 > MAX_TWEET_LENGTH:
+                    # Long tweets are truncated by the API, with a link to the full text.
+                    text = text[:MAX_TWEET_LENGTH - len(url) - 2] + '…'
+                text = text + ' ' + url
+            texts.append(text[:MAX_TWEET_LENGTH])
+        return texts
+
+
+    def statuses(self, n, start_id=1, end_date=None, interval_minutes=90):
+        """
+        Definition:
+            Generates 'n' tweets of one user as 'FakeStatus' objects (Eg: a timeline for 'FakeTwitterAPI').
+
+        Parameters:
+            - n (int)
+            - start_id (int): Id of the oldest tweet; ids increase by one per tweet.
+            - end_date (datetime): Date of the newest tweet (defaults to now).
+            - interval_minutes (float): Mean time between two tweets.
+
+        Returns:
+            - List of 'FakeStatus' objects, oldest first.
+
+        """
+        end_date = end_date or datetime.datetime.now().replace(microsecond=0)
+        random = self.random
+        texts = self.texts(n)
+        gaps = random.exponential(interval_minutes * 60, n)
+        dates = [end_date - datetime.timedelta(seconds=int(seconds)) for seconds in np.cumsum(gaps[::-1])[::-1]]
+        sources = random.choice(self._sources, n, p=self._source_weights)
+        # Most tweets get a handful of likes / retweets, a few get a very large number.
+        likes = np.floor(random.lognormal(1.0, 2.5, n)).astype(int)
+        retweet_counts = np.floor(random.lognormal(0.0, 2.5, n)).astype(int)
+        return [
+            FakeStatus(start_id + i, texts[i], dates[i], str(sources[i]), int(likes[i]), int(retweet_counts[i]))
+            for i in range(n)
+        ]
+
+
+    def timelines(self, usernames, tweets_per_user):
+        """
+        Returns dictionary of username -> list of 'FakeStatus', with ids unique across users.
+        """
+        return {
+            username: self.statuses(tweets_per_user, start_id=i * tweets_per_user + 1)
+            for i, username in enumerate(usernames)
+        }
+
+
+    def write_jsonl(self, json_filename, n, chunk_size=10000):
+        """
+        Definition:
+            Writes 'n' tweets in the format of a streaming API dump (as written by 'TwitterListener').
+
+        Parameters:
+            - json_filename (string)
+            - n (int)
+            - chunk_size (int): Tweets generated at a time, to bound memory use.
+
+        Returns:
+            - Integer count of tweets written.
+
+        """
+        with open(json_filename, 'w') as json_file:
+            for start in range(0, n, chunk_size):
+                for status in self.statuses(min(chunk_size, n - start), start_id=start + 1):
+                    json_file.write(json.dumps({
+                        'created_at': status.created_at.strftime('%a %b %d %H:%M:%S +0000 %Y'),
+                        'id': status.id,
+                        'text': status.text,
+                        'source': status.source,
+                        'retweet_count': status.retweet_count,
+                        'favorite_count': status.favorite_count
+                    }) + '\n')
+        return n
@@ -0,0 +1,53 @@
+# Tests of the cross-user mention graph (run with 'python -m pytest')
+import sqlite3
+import pandas as pd
+import text_processing
+from mention_graph import MentionGraphIndex
+
+
+
+def make_tweets(rows):
+    return pd.DataFrame(rows, columns=['tweets', 'id', 'date'])
+
+
+def test_extract_handles_keeps_underscores():
+    tweets = pd.Series(["@Caley_graphics and @_x_ say hi to @FCBayern", "mail me at fan@example.com", "@a_sixteen_chars_"])
+    assert text_processing.extract_handles(tweets).tolist() == [['Caley_graphics', '_x_', 'FCBayern'], [], []]
+    # The legacy mention counts still stop at the first underscore.
+    assert text_processing.extract_mentions(tweets.iloc[:1]).tolist() == [['@Caley', '@FCBayern']]
+
+
+def test_underscored_handle_is_mentioned(tmp_path):
+    mention_graph = MentionGraphIndex(str(tmp_path / 'graph.sqlite'))
+    try:
+        mention_graph.update('BalgaFCB', make_tweets([
+            ("Great design by @Caley_graphics", 1, '2019-10-01 10:00:00'),
+            ("RT @caley_graphics: new kit", 2, '2019-10-02 10:00:00'),
+            ("Nothing to see here", 3, '2019-10-03 10:00:00')
+        ]))
+        df = mention_graph.mentioned_by('Caley_graphics')
+        assert df['author'].tolist() == ['BalgaFCB']
+        assert df['mentions'].tolist() == [2]
+        df_top = mention_graph.top_mentioned(1)
+        assert df_top['mentioned'].str.lower().tolist() == ['caley_graphics']
+        assert mention_graph.mentioned_by('Caley').empty
+    finally:
+        mention_graph.close()
+
+
+def test_graph_of_another_pattern_is_emptied(tmp_path):
+    db_filename = str(tmp_path / 'graph.sqlite')
+    mention_graph = MentionGraphIndex(db_filename)
+    mention_graph.update('BalgaFCB', make_tweets([("Hi @Caley_graphics", 1, '2019-10-01 10:00:00')]))
+    mention_graph.close()
+    connection = sqlite3.connect(db_filename)
+    connection.execute("UPDATE mention_graph_info SET value = '@[A-Za-z0-9]+'")
+    connection.commit()
+    connection.close()
+
+    mention_graph = MentionGraphIndex(db_filename)
+    try:
+        assert not mention_graph.has_handle('BalgaFCB')
+        assert mention_graph.top_mentioned(10).empty
+    finally:
+        mention_graph.close()
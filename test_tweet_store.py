@@ -0,0 +1,53 @@
+# Tests of the date ranges of the tweet stores and sentiment rollups (run with 'python -m pytest')
+import datetime
+import pandas as pd
+from tweet_store import TWEET_COLUMNS, TweetStore, SQLiteTweetStore, end_bound
+from sentiment_rollups import SentimentRollupIndex
+
+
+
+def make_tweets():
+    # Newest first, as stored.
+    dates = pd.to_datetime(['2020-02-01 00:00:00', '2020-01-31 23:30:00', '2020-01-31 00:00:00', '2020-01-30 12:00:00'])
+    return pd.DataFrame({
+        'tweets': ["tweet {}".format(i) for i in range(4)],
+        'id': [4, 3, 2, 1],
+        'len': [7, 7, 7, 7],
+        'date': dates,
+        'source': ['web'] * 4,
+        'likes': [1, 2, 3, 4],
+        'retweets': [0, 1, 0, 1],
+        'polarity': [0.1, 0.2, 0.3, 0.4],
+        'subjectivity': [0.5, 0.5, 0.5, 0.5]
+    }, columns=TWEET_COLUMNS)
+
+
+def test_end_bound():
+    assert end_bound('2020-01-31') == ('<', pd.Timestamp('2020-02-01'))
+    assert end_bound(datetime.date(2020, 1, 31)) == ('<', pd.Timestamp('2020-02-01'))
+    assert end_bound('2020-01-31 12:00:00') == ('<=', pd.Timestamp('2020-01-31 12:00:00'))
+    assert end_bound(datetime.datetime(2020, 1, 31)) == ('<=', pd.Timestamp('2020-01-31'))
+
+
+def test_date_only_end_includes_the_whole_day(tmp_path):
+    sqlite_store = SQLiteTweetStore(str(tmp_path / 'tweets.sqlite'))
+    csv_store = TweetStore(str(tmp_path))
+    try:
+        for tweet_store in (sqlite_store, csv_store):
+            tweet_store.replace('user', make_tweets())
+            df = tweet_store.load_tweets(['user'], columns=['id', 'date'], start='2020-01-31', end='2020-01-31')
+            assert sorted(df['id']) == [2, 3]
+            df = tweet_store.load_tweets(['user'], columns=['id'], end='2020-01-31 00:00:00')
+            assert sorted(df['id']) == [1, 2]
+    finally:
+        sqlite_store.close()
+
+
+def test_rollup_query_date_only_end(tmp_path):
+    rollup_index = SentimentRollupIndex(str(tmp_path / 'tweets.sqlite'))
+    try:
+        rollup_index.rebuild('user', make_tweets())
+        df = rollup_index.query('user', granularity='hour', start='2020-01-31', end='2020-01-31')
+        assert df['bucket'].tolist() == [pd.Timestamp('2020-01-31 00:00:00'), pd.Timestamp('2020-01-31 23:00:00')]
+    finally:
+        rollup_index.close()
@@ -0,0 +1,32 @@
+# Tests of the word frequency tables behind the word clouds (run with 'python -m pytest')
+from wordcloud import WordCloud
+from word_frequencies import TOKEN_PATTERN, WordFrequencyTable
+
+STOP_WORDS = frozenset(['the', 'and', 'a', 'is', 'to'])
+TEXTS = ["Bayern Munich wins again"] * 40 + ["The fans love cats and a cat's toys", "Fan club", "fans club 2019"]
+
+
+
+def test_cloud_counts_match_wordcloud_on_raw_text():
+    text = ' '.join(TEXTS).lower()
+    expected = WordCloud(stopwords=STOP_WORDS, regexp=TOKEN_PATTERN.pattern).process_text(text)
+    counts = WordFrequencyTable().update([text], stop_words=STOP_WORDS).cloud_counts()
+    assert counts == expected
+    assert counts['bayern munich'] == 40
+    assert counts['fan'] == 3 and 'fans' not in counts
+
+
+def test_merged_tables_keep_bigrams(tmp_path):
+    first = WordFrequencyTable().update(TEXTS[:20], stop_words=STOP_WORDS)
+    first.save(str(tmp_path / 'words.json'))
+    merged = WordFrequencyTable.load(str(tmp_path / 'words.json')).merge(
+        WordFrequencyTable().update(TEXTS[20:], stop_words=STOP_WORDS))
+    assert merged.cloud_counts() == WordFrequencyTable().update(TEXTS, stop_words=STOP_WORDS).cloud_counts()
+    # Bigrams are counted within each text only.
+    assert 'again bayern' not in merged.bigram_counts
+
+
+def test_word_counts_only_file_is_not_loaded(tmp_path):
+    filename = tmp_path / 'words.json'
+    filename.write_text('{"bayern": 3}')
+    assert WordFrequencyTable.load(str(filename)) is None
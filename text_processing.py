@@ -0,0 +1,94 @@
+# Vectorized tweet text processing
+import re
+import numpy as np
+import pandas as pd
+
+# Reference definition of tweet cleaning: every match is replaced by a space, then whitespace is collapsed.
+CLEAN_TWEET_PATTERN = re.compile(r"(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)")
+
+# 'clean_tweet' produces the same output as the reference pattern, in three cheaper passes:
+# links, then mentions, then a byte-level translation of every other special character.
+# A link can only start on an alphanumeric character that does not continue a word or a mention.
+URL_PATTERN = re.compile(r"(?<![A-Za-z0-9@])[A-Za-z0-9]\w*://\S+")
+MENTION_PATTERN = re.compile(r"@[A-Za-z0-9]+")
+# Full Twitter handles (letters, digits and underscores, up to 15), not preceded by a handle character as in e-mails.
+# 'MENTION_PATTERN' stops at the first underscore; it stays the definition of cleaning and of 'count_mentions'.
+HANDLE_PATTERN = re.compile(r"(?<![A-Za-z0-9_])@([A-Za-z0-9_]{1,15})(?![A-Za-z0-9_])")
+_ALLOWED_BYTES = set(b"0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ \t")
+_SPECIAL_CHARS_TO_SPACES = bytes(byte if byte in _ALLOWED_BYTES else ord(' ') for byte in range(256))
+
+RETWEET_PREFIX = 'RT '
+
+
+
+def clean_tweet(tweet):
+    """
+    Removes mentions, links and special characters from a single tweet.
+    """
+    if '://' in tweet:
+        tweet = URL_PATTERN.sub(' ', tweet)
+    if '@' in tweet:
+        tweet = MENTION_PATTERN.sub(' ', tweet)
+    # Non-ASCII characters become '?' (one per character), which the table then turns into a space.
+    tweet = tweet.encode('ascii', 'replace').translate(_SPECIAL_CHARS_TO_SPACES).decode('ascii')
+    return ' '.join(tweet.split())
+
+
+def clean_tweets(tweet_series):
+    """
+    Definition:
+        Column-wise version of 'clean_tweet'.
+
+    Parameters:
+        - tweet_series (Pandas Series of strings)
+
+    Returns:
+        - Pandas Series of cleaned tweets (same index as 'tweet_series').
+
+    """
+    return tweet_series.map(clean_tweet)
+
+
+def is_retweet(tweet_series):
+    """
+    Returns boolean Pandas Series that is True for retweets (tweets starting with 'RT ').
+    """
+    return tweet_series.astype(str).str.startswith(RETWEET_PREFIX)
+
+
+def extract_mentions(tweet_series):
+    """
+    Returns Pandas Series of lists of mentions (Eg: ['@FCBayern']) found in each tweet.
+    """
+    return tweet_series.astype(str).str.findall(MENTION_PATTERN)
+
+
+def extract_handles(tweet_series):
+    """
+    Returns Pandas Series of lists of the handles mentioned in each tweet, without the '@' (Eg: ['Caley_graphics']).
+    """
+    return tweet_series.astype(str).str.findall(HANDLE_PATTERN)
+
+
+def count_mentions(tweet_series):
+    """
+    Definition:
+        Counts how often each username is mentioned across all tweets in 'tweet_series'.
+
+    Parameters:
+        - tweet_series (Pandas Series of strings)
+
+    Returns:
+        - Pandas DataFrame with columns ['username', 'mentions_received'], sorted by
+          'mentions_received' (descending). Ties keep the order of first appearance.
+
+    """
+    mentions = extract_mentions(tweet_series).explode().dropna()
+    codes, unique_mentions = pd.factorize(mentions)
+    df_mentioned = pd.DataFrame({
+        'username': np.asarray(unique_mentions, dtype=object),
+        'mentions_received': np.bincount(codes, minlength=len(unique_mentions))
+    })
+    df_mentioned.sort_values(by='mentions_received', ascending=False, kind='mergesort', inplace=True)
+    df_mentioned.reset_index(drop=True, inplace=True)
+    return df_mentioned
@@ -1,108 +1,83 @@
-# Twitter and API related
-from tweepy import API
-from tweepy import Cursor
-from tweepy.streaming import StreamListener
-from tweepy import OAuthHandler
-from tweepy import Stream
-import twitter_credentials
-from twitter_handles import usernames, number_of_tweets
-
-# Data manipulation, analysis and visualization
-import json
+# Configuration and storage
+# Heavy or optional dependencies are imported where they are used: tweepy (and 'twitter_credentials')
+# through 'twitter_client', TextBlob when a text is first scored, matplotlib and wordcloud through
+# 'chart_rendering', and nltk when stop words are first needed.
+from twitter_handles import usernames, number_of_tweets, sentiment_workers, fetch_workers, incremental_sync, \
+    results_backend, export_csv, render_workers, rollup_chart_granularity, pipeline_queue_size, \
+    run_report_filename, trace_memory, profile_stage, profiler
+from sentiment_cache import SentimentCache
+import text_processing
+from tweet_json_reader import TweetJsonReader
+from fetch_scheduler import TimelineFetchScheduler
+from tweet_store import TweetStore, SQLiteTweetStore
+from sentiment_rollups import SentimentRollupIndex
+from mention_graph import MentionGraphIndex
+from async_pipeline import AsyncTweetPipeline
+from instrumentation import RunInstrumentation
+
+# Data manipulation and analysis
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
 # NLP
-import re
-from textblob import TextBlob
-from wordcloud import WordCloud
-from nltk.corpus import stopwords
+from functools import lru_cache
+from importlib.metadata import version
+from word_frequencies import WordFrequencyTable, get_stop_words
 
+# Classes of 'twitter_client' that can still be imported from this module.
+TWITTER_CLIENT_CLASSES = ('TwitterClient', 'TwitterAuthenticator', 'TwitterStreamer', 'TwitterListener')
 
+# Upper bound on the number of distinct cleaned texts whose scores are memoized in-process.
+SENTIMENT_MEMO_SIZE = 100000
 
-# Twitter client
-class TwitterClient():
-    def __init__(self, twitter_user=None):
-        self.auth = TwitterAuthenticator().authenticate_twitter_app()
-        self.twitter_client = API(self.auth)
-        self.twitter_user = twitter_user
+# Bump the suffix whenever 'clean_tweet' or 'score_cleaned_text' changes, so cached scores are not reused.
+# Read from package metadata, which does not import TextBlob.
+SENTIMENT_ANALYZER_VERSION = "textblob-{}/v1".format(version('textblob'))
 
-    def get_twitter_client_api(self):
-        return self.twitter_client
+# Sentiment cache shared by 'tweet_analysis.py' and 'sentiment_comparison.py'.
+SENTIMENT_CACHE_FILENAME = "./results/sentiment_cache.sqlite"
 
-    def get_user_timeline_tweets(self, num_tweets):
-        tweets = []
-        for tweet in Cursor(self.twitter_client.user_timeline, id=self.twitter_user).items(num_tweets):
-            tweets.append(tweet)
-        return tweets
+# Database of analyzed tweets used when 'results_backend' is 'sqlite' (also holds the sentiment rollups).
+RESULTS_DB_FILENAME = "./results/tweets.sqlite"
 
-    def get_friend_list(self, num_friends):
-        friend_list = []
-        for friend in Cursor(self.twitter_client.friends, id=self.twitter_user).items(num_friends):
-            friend_list.append(friend)
-        return friend_list
 
-    def get_home_timeline_tweets(self, num_tweets):
-        home_timeline_tweets = []
-        for tweet in Cursor(self.twitter_client.home_timeline, id=self.twitter_user).items(num_tweets):
-            home_timeline_tweets.append(tweet)
-        return home_timeline_tweets
-
-
-
-# Twitter authenticator
-class TwitterAuthenticator():
-
-    def authenticate_twitter_app(self):
-        auth = OAuthHandler(twitter_credentials.CONSUMER_KEY, twitter_credentials.CONSUMER_SECRET)
-        auth.set_access_token(twitter_credentials.ACCESS_TOKEN, twitter_credentials.ACCESS_TOKEN_SECRET)
-        return auth
 
+# Sentiment scoring
+@lru_cache(maxsize=SENTIMENT_MEMO_SIZE)
+def score_cleaned_text(cleaned_text):
+    """
+    Returns tuple of (polarity, subjectivity) for an already cleaned text, both rounded to 2 decimals.
+    Results are memoized, so repeated texts (retweets, boilerplate posts) are only scored once.
+    """
+    from textblob import TextBlob
+    sentiment = TextBlob(cleaned_text).sentiment
+    return round(sentiment.polarity, 2), round(sentiment.subjectivity, 2)
 
 
-# Twitter Streamer
-class TwitterStreamer():
+def score_tweet(tweet):
     """
-    Class for streaming and processing live tweets.
+    Returns tuple of (polarity, subjectivity) for a single raw tweet.
     """
-    def __init__(self):
-        self.twitter_autenticator = TwitterAuthenticator()
+    return score_cleaned_text(text_processing.clean_tweet(tweet))
 
-    def stream_tweets(self, fetched_tweets_filename, hash_tag_list):
-        # This handles Twitter authetification and the connection to Twitter Streaming API
-        listener = TwitterListener(fetched_tweets_filename)
-        auth = self.twitter_autenticator.authenticate_twitter_app()
-        stream = Stream(auth, listener)
 
-        # This line filter Twitter Streams to capture data by the keywords: 
-        stream.filter(track=hash_tag_list)
+def _init_sentiment_worker():
+    # Loads TextBlob's sentiment lexicon once per worker process, rather than once per task.
+    from textblob import TextBlob
+    TextBlob("warm up").sentiment
 
 
+def _score_cleaned_chunk(cleaned_texts):
+    return [score_cleaned_text(text) for text in cleaned_texts]
 
-# Twitter stream listener
-class TwitterListener(StreamListener):
-    """
-    This is a basic listener that just prints received tweets to stdout.
-    """
-    def __init__(self, fetched_tweets_filename):
-        self.fetched_tweets_filename = fetched_tweets_filename
-
-    def on_data(self, data):
-        try:
-            with open(self.fetched_tweets_filename, 'a') as tf:
-                tf.write(data)
-            print("Fetch successful")
-            return True
-        except BaseException as e:
-            print("Error on_data %s" % str(e))
-        return True
-          
-    def on_error(self, status):
-        if status == 420:
-            # Returning False on_data method in case rate limit occurs.
-            return False
-        print(status)
+
+def __getattr__(name):
+    # Loads tweepy only when a Twitter API class is actually used (Eg: 'tweet_analysis.TwitterClient').
+    if name in TWITTER_CLIENT_CLASSES:
+        import twitter_client
+        return getattr(twitter_client, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 
@@ -111,25 +86,92 @@ class TweetAnalyzer():
     """
     Functionality for analyzing and categorizing content from tweets.
     """
-    
+    def __init__(self, sentiment_cache=None, n_workers=1, chunk_size=500):
+        # Optional 'SentimentCache' consulted before scoring any text.
+        self.sentiment_cache = sentiment_cache
+        # With 'n_workers' > 1, texts are scored in a process pool, 'chunk_size' texts per task.
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        self._process_pool = None
+
+
+    def close(self):
+        """
+        Shuts down the worker processes used for parallel sentiment scoring (if any).
+        """
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+            self._process_pool = None
+
+
     def clean_tweet(self, tweet):
-        return ' '.join(re.sub("(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)", " ", tweet).split())
+        return text_processing.clean_tweet(tweet)
     
 
     def analyze_polarity(self, tweet):
-        analysis = TextBlob(self.clean_tweet(tweet))
-        polarity_score = round(analysis.sentiment.polarity, 2)
+        polarity_score, _ = score_cleaned_text(self.clean_tweet(tweet))
         return polarity_score
     
 
     def analyze_subjectivity(self, tweet):
-        analysis = TextBlob(self.clean_tweet(tweet))
-        subjectivity_score = round(analysis.sentiment.subjectivity, 2)
+        _, subjectivity_score = score_cleaned_text(self.clean_tweet(tweet))
         return subjectivity_score
 
 
+    def analyze_sentiment_batch(self, texts):
+        """
+        Definition:
+            Cleans each text once and computes its polarity and subjectivity together.
+
+        Parameters:
+            - texts (iterable of strings)
+
+        Returns:
+            - Tuple of NumPy arrays (polarity_scores, subjectivity_scores), in the same order as 'texts'.
+
+        """
+        cleaned_texts = list(text_processing.clean_tweets(pd.Series(texts, dtype=object)))
+        scores_by_text = dict()
+        if self.sentiment_cache is not None:
+            scores_by_text = self.sentiment_cache.get_many(cleaned_texts)
+
+        texts_to_score = [text for text in dict.fromkeys(cleaned_texts) if text not in scores_by_text]
+        new_scores = dict(zip(texts_to_score, self.score_cleaned_texts(texts_to_score)))
+        if self.sentiment_cache is not None:
+            self.sentiment_cache.put_many(new_scores)
+        scores_by_text.update(new_scores)
+
+        scores = [scores_by_text[text] for text in cleaned_texts]
+        polarity_scores = np.array([score[0] for score in scores], dtype=float)
+        subjectivity_scores = np.array([score[1] for score in scores], dtype=float)
+        return polarity_scores, subjectivity_scores
+
+
+    def score_cleaned_texts(self, cleaned_texts):
+        """
+        Definition:
+            Scores a list of cleaned texts, splitting them into chunks scored by a process pool
+            when 'n_workers' > 1. The output is identical to (and in the same order as) the serial path.
+
+        Parameters:
+            - cleaned_texts (list of strings)
+
+        Returns:
+            - List of (polarity, subjectivity) tuples.
+
+        """
+        if self.n_workers <= 1 or len(cleaned_texts) <= self.chunk_size:
+            return _score_cleaned_chunk(cleaned_texts)
+
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_sentiment_worker)
+        chunks = [cleaned_texts[start:start + self.chunk_size] for start in range(0, len(cleaned_texts), self.chunk_size)]
+        # 'map' yields results in submission order, regardless of which worker finishes first.
+        return [score for chunk_scores in self._process_pool.map(_score_cleaned_chunk, chunks) for score in chunk_scores]
+
+
     # Creating DataFrame from JSON file extracted.
-    def create_df_from_json(self, json_filename):
+    def create_df_from_json(self, json_filename, chunk_size=10000):
         """
         Definition:
             Takes in a JSON filename (Eg: 'tweets_politics.json') and returns
@@ -137,161 +179,228 @@ class TweetAnalyzer():
 
         Parameters:
             - json_filename (string)
+            - chunk_size (int): Number of lines parsed before being projected into a DataFrame.
 
         Returns:
             - Pandas DataFrame containing tweet data.
 
         """
-        # json_filename = 'tweets_politics.json'
-        list_of_dicts = list()
-        with open(json_filename, 'r') as json_file:
-            for json_obj in json_file:
-                try:
-                    dict_json_obj = json.loads(json_obj)
-                    # print(type(dict_json_obj))
-                    list_of_dicts.append(dict_json_obj)
-                except ValueError as ve:
-                    # print("ValueErrorMsg: {}".format(ve))
-                    pass
-
-        df_twitter_data = pd.DataFrame(list_of_dicts)
-        rename_dict = {
-            'text': 'tweets',
-            'id': 'id',
-            'created_at': 'date',
-            'source': 'source',
-            'retweet_count': 'retweets',
-            'favorite_count': 'likes'
-        }
-        columns_required = list(rename_dict.values())
-        df_twitter_data.rename(rename_dict, axis=1, inplace=True)
-        df_twitter_data = df_twitter_data.loc[:, columns_required]
-        df_twitter_data['len'] = df_twitter_data['tweets'].apply(len)
-        return df_twitter_data
+        reader = TweetJsonReader(json_filename, chunk_size=chunk_size)
+        chunks = list(reader)
+        if reader.malformed_lines:
+            print("Skipped {} malformed line(s) in '{}'".format(reader.malformed_lines, json_filename))
+        if not chunks:
+            return reader.rows_to_data_frame([])
+        return pd.concat(chunks, ignore_index=True)
+
+
+    def iter_df_from_json(self, json_filename, chunk_size=10000, offset=0, tail=False):
+        """
+        Definition:
+            Streaming version of 'create_df_from_json', for dumps too large to hold in memory.
+
+        Parameters:
+            - json_filename (string)
+            - chunk_size (int): Maximum number of tweets per DataFrame.
+            - offset (int): Byte offset to resume reading from.
+            - tail (bool): The file is still being written (see 'TweetJsonReader').
+
+        Returns:
+            - 'TweetJsonReader' that yields DataFrames, and exposes the byte 'offset' reached
+              and counters of malformed lines.
+
+        """
+        return TweetJsonReader(json_filename, chunk_size=chunk_size, offset=offset, tail=tail)
 
 
     # Tweets to DataFrame
     def tweets_to_data_frame(self, tweets):
-        df = pd.DataFrame(data=[tweet.text for tweet in tweets], columns=['tweets'])
-        df['id'] = np.array([tweet.id for tweet in tweets])
-        df['len'] = np.array([len(tweet.text) for tweet in tweets])
-        df['date'] = np.array([tweet.created_at for tweet in tweets])
-        df['source'] = np.array([tweet.source for tweet in tweets])
-        df['likes'] = np.array([tweet.favorite_count for tweet in tweets])
-        df['retweets'] = np.array([tweet.retweet_count for tweet in tweets])
-        df['polarity'] = np.array([self.analyze_polarity(tweet.text) for tweet in tweets])
-        df['subjectivity'] = np.array([self.analyze_subjectivity(tweet.text) for tweet in tweets])
-        return df
+        """
+        Definition:
+            Builds the DataFrame of 'tweets' in a single pass, copying only the fields used into preallocated
+            columns (no reference to the 'Status' objects is kept). Columns use compact dtypes: categorical
+            'source' and the narrowest unsigned integer type fitting 'len', 'likes' and 'retweets'. Scores stay
+            float64, so they are stored and averaged exactly as scored.
+
+        Parameters:
+            - tweets (list): tweepy 'Status' objects (or objects with the same attributes).
+
+        Returns:
+            - Pandas DataFrame with the columns of 'tweet_store.TWEET_COLUMNS'.
+
+        """
+        n_tweets = len(tweets)
+        # Filling preallocated lists and converting each once is about twice as fast as setting numpy items.
+        texts = [None] * n_tweets
+        ids = [0] * n_tweets
+        dates = [None] * n_tweets
+        sources = [None] * n_tweets
+        likes = [0] * n_tweets
+        retweets = [0] * n_tweets
+        for i, tweet in enumerate(tweets):
+            texts[i] = tweet.text
+            ids[i] = tweet.id
+            dates[i] = tweet.created_at
+            sources[i] = tweet.source
+            likes[i] = tweet.favorite_count
+            retweets[i] = tweet.retweet_count
+        texts = np.array(texts, dtype=object)
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=n_tweets)
+
+        polarity, subjectivity = self.analyze_sentiment_batch(texts)
+        return pd.DataFrame({
+            'tweets': texts,
+            'id': np.array(ids, dtype=np.int64),
+            'len': pd.to_numeric(lengths, downcast='unsigned'),
+            'date': pd.to_datetime(dates),
+            'source': pd.Categorical(sources),
+            'likes': pd.to_numeric(np.array(likes, dtype=np.int64), downcast='unsigned'),
+            'retweets': pd.to_numeric(np.array(retweets, dtype=np.int64), downcast='unsigned'),
+            'polarity': polarity,
+            'subjectivity': subjectivity
+        })
     
 
     def drop_retweets(self, tweet):
         """
         Returns False if tweet is a retweet; returns True otherwise.
+        Prefer 'get_original_tweets' for whole DataFrames.
+        """
+        return not str(tweet).startswith(text_processing.RETWEET_PREFIX)
+
+
+    def get_original_tweets(self, df):
+        """
+        Returns subset of DataFrame 'df' without retweets.
         """
-        if str(tweet)[:3] == 'RT ':
-            return False
-        return True
+        return df[~text_processing.is_retweet(df['tweets'])]
     
     
-    def extract_mentions(self, tweet_series):
-        mention = re.findall('@[A-Za-z0-9]+', tweet_series)
-        return mention
+    def extract_mentions(self, tweet):
+        return text_processing.MENTION_PATTERN.findall(tweet)
 
     
     def get_mention_stats(self, df):
-        series = df['tweets'].apply(self.extract_mentions)
-        series_list = [mention for row in series for mention in row]
-
-        dict_mention_counts = dict()
-        for mentioner in series_list:
-            if mentioner in dict_mention_counts.keys():
-                count = dict_mention_counts[mentioner]
-                count += 1
-                dict_mention_counts[mentioner] = count
-            else:
-                dict_mention_counts[mentioner] = 1
-
-        df_mentioned = pd.DataFrame({
-            'username': list(dict_mention_counts.keys()),
-            'mentions_received': list(dict_mention_counts.values())
-        })
-        df_mentioned.sort_values(by='mentions_received', ascending=False, inplace=True)
-        df_mentioned.reset_index(drop=True, inplace=True)
-        return df_mentioned
+        return text_processing.count_mentions(df['tweets'])
 
 
-    def create_plots(self, df_with_sentiment):
+    def create_plots(self, df_with_sentiment, username, results_path):
         """
         Creates and saves visualizations regarding the sentiment extracted.
         Plots are over a period of time (specified by the dates).
         """
-        dates = df_with_sentiment['date']
-        step_size = 0.25
-        
-        plt.figure(figsize = (25, 14))
-        plt.style.use('ggplot') # ['fivethirtyeight', 'seaborn-dark', 'seaborn-ticks', 'ggplot']
-        plt.plot(dates, np.zeros(len(df_with_sentiment['polarity'])), linestyle='-.', linewidth=4, color ='#696969', label='Neutral')
-        plt.plot(dates, df_with_sentiment['polarity'], linewidth=3, linestyle='-.', color='blue', label='Polarity slope')
-        plt.scatter(dates, df_with_sentiment['polarity'], marker='*', s=200, color='red', label='Data points')
-        plt.title("{} - Polarity scores over time (B/w -1 and +1)".format(username), fontsize=40)
-        plt.xlabel("Date", fontsize=30)
-        plt.ylabel("Polarity score", fontsize=30)
-        plt.xticks(fontsize=20, rotation=50)
-        plt.yticks(np.arange(-1, 1 + step_size, step=step_size), fontsize=20)
-        plt.tight_layout()
-        plt.grid()
-        plt.legend(loc='best', fontsize=24)
-        plt.savefig("{}/{} - Polarity scores over time.png".format(results_path, username))
-        
-        plt.figure(figsize = (25, 14))
-        plt.style.use('ggplot') # ['fivethirtyeight', 'seaborn-dark', 'seaborn-ticks', 'ggplot']
-        plt.plot(dates, df_with_sentiment['subjectivity'], linestyle='-.', linewidth=3, color='blue', label='Subjectivity slope')
-        plt.scatter(dates, df_with_sentiment['subjectivity'], marker='*', s=200, color='red', label='Data points')
-        plt.title("{} - Subjectivity scores over time (B/w 0 and +1)".format(username), fontsize=40)
-        plt.xlabel("Date", fontsize=30)
-        plt.ylabel("Subjectivity score", fontsize=30)
-        plt.xticks(fontsize=20, rotation=50)
-        plt.yticks(np.arange(0, 1 + step_size, step=step_size), fontsize=20)
-        plt.tight_layout()
-        plt.grid()
-        plt.legend(loc='best', fontsize=24)
-        plt.savefig("{}/{} - Subjectivity scores over time.png".format(results_path, username))
+        from chart_rendering import ChartRenderer
+        ChartRenderer().render_sentiment_charts(username, df_with_sentiment, results_path)
 
 
     def populate_stop_words(self):
         """
-        Returns list of stopwords using the 'nltk.corpus' module.
+        Returns list of stopwords using the 'nltk.corpus' module (loaded once, then cached).
+        """
+        return list(get_stop_words('english'))
+
+
+    def count_words(self, df_with_sentiment):
+        """
+        Returns 'WordFrequencyTable' of all words used in the entries.
         """
-        stop_words = stopwords.words('english')
-        return stop_words
+        return WordFrequencyTable().update(df_with_sentiment['tweets'], stop_words=get_stop_words('english'))
 
 
-    def create_wordcloud(self, df_with_sentiment):
+    def create_wordcloud(self, username, results_path, df_with_sentiment=None, word_frequencies=None):
         """
-        Creates WordCloud of all words used in the entries.
+        Creates WordCloud of all words used in the entries, or from an existing 'WordFrequencyTable'
+        (Eg: one merged across runs or users) when 'word_frequencies' is given.
         """
-        comment_words = ' '
-        stopwords = self.populate_stop_words()
-        
-        for entry in df_with_sentiment['tweets']:
-            entry = str(entry)
-            tokens = entry.split() 
-            for i in range(len(tokens)):
-                tokens[i] = tokens[i].lower()
-            
-            for words in tokens:
-                comment_words = comment_words + words + ' '
-        
-        # Create object of 'WordCloud'.
-        wordcloud = WordCloud(width=800, height=800, background_color='white', stopwords=stopwords,
-                            min_font_size=10).generate(comment_words)
-        
-        # Plot.
-        plt.figure(figsize = (15, 10), facecolor=None)
-        plt.imshow(wordcloud)
-        plt.axis("off")
-        plt.tight_layout(pad=0)
-        plt.savefig("{}/{} - WordCloud of original tweets.png".format(results_path, username))
+        if word_frequencies is None:
+            word_frequencies = self.count_words(df_with_sentiment)
+        from chart_rendering import ChartRenderer
+        ChartRenderer().render_wordcloud(username, word_frequencies, results_path)
+
+
+
+
+# Timeline analysis
+def open_tweet_store(results_path="./results"):
+    """
+    Returns the store configured by 'results_backend': 'SQLiteTweetStore' (filled from the CSV files
+    in 'results_path' on first use) or 'TweetStore'.
+    """
+    if results_backend == 'sqlite':
+        tweet_store = SQLiteTweetStore(RESULTS_DB_FILENAME)
+        if tweet_store.is_empty():
+            tweet_store.import_csv_results(results_path)
+        return tweet_store
+    return TweetStore(results_path)
+
+
+def analyze_timelines(usernames, number_of_tweets, results_path="./results"):
+    """
+    Definition:
+        Fetches, scores, stores and plots the timelines of 'usernames' (settings from 'twitter_handles.py').
+
+    Parameters:
+        - usernames (list of strings): Twitter usernames (handles).
+        - number_of_tweets (int): Number of tweets to extract per handle via the API.
+        - results_path (string)
+
+    Returns:
+        - Dictionary of pipeline statistics (see 'AsyncTweetPipeline.stats').
+
+    """
+    from twitter_client import TwitterClient
+    from chart_rendering import ChartRenderer
+
+    instrumentation = None
+    if run_report_filename is not None:
+        profile_filename = None
+        if profile_stage is not None:
+            profile_filename = "{}/profile_{}.{}".format(results_path, profile_stage, 'prof' if profiler == 'cprofile' else 'folded')
+        instrumentation = RunInstrumentation(trace_memory=trace_memory, profile_stage=profile_stage, profiler=profiler,
+                                             profile_filename=profile_filename)
+
+    twitter_client = TwitterClient()
+    sentiment_cache = SentimentCache(SENTIMENT_CACHE_FILENAME, SENTIMENT_ANALYZER_VERSION)
+    tweet_analyzer = TweetAnalyzer(sentiment_cache=sentiment_cache, n_workers=sentiment_workers)
+    api = twitter_client.get_twitter_client_api()
+    fetch_scheduler = TimelineFetchScheduler(api, max_workers=fetch_workers)
+    chart_renderer = ChartRenderer(max_workers=render_workers)
+    tweet_store = open_tweet_store(results_path)
+    rollup_index = SentimentRollupIndex(RESULTS_DB_FILENAME)
+    mention_graph = MentionGraphIndex(RESULTS_DB_FILENAME)
+
+    # With 'incremental_sync', only tweets newer than the ones already stored in 'results_path' are fetched and scored.
+    since_ids = tweet_store.latest_ids(usernames) if incremental_sync else None
+
+    # Handles move through the fetch, score, aggregate, render and persist stages concurrently;
+    # each stage works on a different handle, and a slow stage holds back the ones before it.
+    pipeline = AsyncTweetPipeline(tweet_analyzer, fetch_scheduler, tweet_store, rollup_index, chart_renderer,
+                                  results_path, number_of_tweets, incremental_sync=incremental_sync,
+                                  # The CSV backend has already written the 'all' file while storing the tweets.
+                                  write_csv=(results_backend == 'csv' or export_csv),
+                                  include_all_csv=(results_backend != 'csv'),
+                                  rollup_chart_granularity=rollup_chart_granularity, queue_size=pipeline_queue_size,
+                                  instrumentation=instrumentation, mention_graph=mention_graph)
+    pipeline_stats = pipeline.run(usernames, since_ids=since_ids)
+    print("\nPipeline: {}".format(pipeline_stats))
+
+    chart_renderer.close()
+    print("\nFetch scheduler: {}".format(fetch_scheduler.stats()))
+    print("Sentiment cache: {}".format(sentiment_cache.stats()))
+    if instrumentation is not None:
+        instrumentation.write_report(run_report_filename, extra={
+            'pipeline': pipeline_stats,
+            'fetch_scheduler': fetch_scheduler.stats(),
+            'sentiment_cache': sentiment_cache.stats()
+        })
+        print("Run report: {}".format(run_report_filename))
+    tweet_analyzer.close()
+    sentiment_cache.close()
+    rollup_index.close()
+    mention_graph.close()
+    if results_backend == 'sqlite':
+        tweet_store.close()
+    return pipeline_stats
 
 
 
@@ -301,6 +410,9 @@ if __name__ == '__main__':
     import warnings
     warnings.filterwarnings("ignore")   
     
+    # from twitter_client import TwitterClient, TwitterStreamer
+    # from live_analytics import RollingWindowAnalytics
+
     # topic = 'politics'
     # hash_tag_list = ['donald trump', 'hillary clinton', 'barack obama', 'bernie sanders']
     # fetched_tweets_filename = 'tweets_{}.json'.format(topic)
@@ -310,28 +422,12 @@ if __name__ == '__main__':
 
     # twitter_streamer = TwitterStreamer()
     # twitter_streamer.stream_tweets(fetched_tweets_filename, hash_tag_list)
-    
-    results_path = "./results"
 
-    twitter_client = TwitterClient()
-    tweet_analyzer = TweetAnalyzer()
-    api = twitter_client.get_twitter_client_api()
+    # Live analytics: 5 minute sliding window, snapshot every 10 seconds.
+    # analytics = RollingWindowAnalytics(hash_tag_list, score_tweet, window_seconds=300,
+    #                                    snapshot_filename='live_{}.jsonl'.format(topic), stop_words=get_stop_words())
+    # twitter_streamer.stream_tweets(fetched_tweets_filename, hash_tag_list, analytics=analytics)
     
     # 'usernames' is a list of Twitter usernames (handles) obtained from another file (check the imports)
     # 'number_of_tweets' is an integer representing the number of tweets to extract via the API
-    for username in usernames:
-        tweets = api.user_timeline(screen_name=username, count=number_of_tweets)
-        
-        df = tweet_analyzer.tweets_to_data_frame(tweets)
-        df_tweets_original = df[df['tweets'].apply(tweet_analyzer.drop_retweets)]
-        df_mentions = tweet_analyzer.get_mention_stats(df)
-        
-        tweet_analyzer.create_plots(df)
-        tweet_analyzer.create_wordcloud(df_tweets_original)
-
-        df.to_csv("{}/{} - Tweet analysis (all).csv".format(results_path, username), index=False)
-        df_tweets_original.to_csv("{}/{} - Tweet analysis (originals).csv".format(results_path, username), index=False)
-        df_mentions.to_csv("{}/{} - Tweet mentions count.csv".format(results_path, username), index=False)
-        
-        print("\nUsername: {}\nTweets requested: {}\nTweets extracted: {}\nOriginal tweets: {}".\
-            format(username, number_of_tweets, len(df), len(df_tweets_original)))
\ No newline at end of file
+    analyze_timelines(usernames, number_of_tweets)
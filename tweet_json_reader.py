@@ -0,0 +1,100 @@
+# Streaming JSONL ingestion
+import json
+import pandas as pd
+
+# Field of a raw streamed tweet -> column of the DataFrame used for analysis.
+TWEET_JSON_FIELDS = {
+    'text': 'tweets',
+    'id': 'id',
+    'created_at': 'date',
+    'source': 'source',
+    'retweet_count': 'retweets',
+    'favorite_count': 'likes'
+}
+
+
+
+class TweetJsonReader():
+    """
+    Reads a JSONL file written by 'TwitterListener' as a sequence of DataFrames.
+    Only the fields listed in 'TWEET_JSON_FIELDS' are kept from each line, so memory use
+    is bounded by 'chunk_size' rather than by the size of the file.
+    """
+    def __init__(self, json_filename, chunk_size=10000, offset=0, tail=False):
+        """
+        Parameters:
+            - json_filename (string)
+            - chunk_size (int): Maximum number of tweets per yielded DataFrame.
+            - offset (int): Byte offset to start reading from (Eg: 'offset' of an earlier reader).
+            - tail (bool): The file is still being written: a last line without a newline is left
+              for the next pass instead of being parsed.
+        """
+        self.json_filename = json_filename
+        self.chunk_size = chunk_size
+        self.offset = offset
+        self.tail = tail
+        self.lines_read = 0
+        self.malformed_lines = 0
+        self.skipped_messages = 0
+
+
+    def __iter__(self):
+        """
+        Yields DataFrames of up to 'chunk_size' tweets, starting at 'offset'.
+        Iterating again later resumes after the last line read, so a growing file can be tailed (see 'tail').
+        """
+        rows = list()
+        with open(self.json_filename, 'rb') as json_file:
+            json_file.seek(self.offset)
+            for line in json_file:
+                if self.tail and not line.endswith(b'\n'):
+                    # Line is still being written; it is picked up on the next pass.
+                    break
+                self.offset += len(line)
+                row = self.parse_line(line)
+                if row is not None:
+                    rows.append(row)
+                if len(rows) >= self.chunk_size:
+                    yield self.rows_to_data_frame(rows)
+                    rows = list()
+        if rows:
+            yield self.rows_to_data_frame(rows)
+
+
+    def parse_line(self, line):
+        """
+        Returns tuple of the required fields of a single JSON line, or None if the line holds no tweet.
+        """
+        line = line.strip()
+        if not line:
+            # Keep-alive newlines sent by the streaming API.
+            return None
+        self.lines_read += 1
+        try:
+            tweet = json.loads(line)
+        except ValueError:
+            self.malformed_lines += 1
+            return None
+        if not isinstance(tweet, dict) or 'text' not in tweet:
+            # Control messages such as {"limit": ...} or {"delete": ...}.
+            self.skipped_messages += 1
+            return None
+        return tuple(tweet.get(field) for field in TWEET_JSON_FIELDS)
+
+
+    def rows_to_data_frame(self, rows):
+        df_twitter_data = pd.DataFrame.from_records(rows, columns=list(TWEET_JSON_FIELDS.values()))
+        df_twitter_data['len'] = df_twitter_data['tweets'].str.len()
+        return df_twitter_data
+
+
+    def stats(self):
+        """
+        Returns dictionary of counters for the lines read so far.
+        """
+        return {
+            'offset': self.offset,
+            'lines_read': self.lines_read,
+            'malformed_lines': self.malformed_lines,
+            'skipped_messages': self.skipped_messages
+        }
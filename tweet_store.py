@@ -0,0 +1,368 @@
+# Local stores of analyzed tweets, for incremental (since_id) syncing and querying
+import datetime
+import glob
+import json
+import os
+import sqlite3
+import pandas as pd
+import text_processing
+
+# Columns of the DataFrames produced by 'TweetAnalyzer.tweets_to_data_frame', in order.
+TWEET_COLUMNS = ['tweets', 'id', 'len', 'date', 'source', 'likes', 'retweets', 'polarity', 'subjectivity']
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+
+def end_bound(end):
+    """
+    Returns tuple (comparison operator, Pandas Timestamp) for the inclusive 'end' of a date range, shared by every
+    date-range query. A date without a time (Eg: '2019-10-07' or a 'datetime.date') includes that whole day,
+    so it becomes an exclusive bound on the next day.
+    """
+    date_only = (isinstance(end, str) and len(end.strip()) == 10) or \
+        (isinstance(end, datetime.date) and not isinstance(end, datetime.datetime))
+    if date_only:
+        return '<', pd.Timestamp(end) + pd.Timedelta(days=1)
+    return '<=', pd.Timestamp(end)
+
+
+
+def write_csv_results(results_path, username, df, df_tweets_original, df_mentions, include_all=True):
+    """
+    Writes the per-user CSV files: all tweets, original tweets and mention counts.
+    """
+    if include_all:
+        df.to_csv("{}/{} - Tweet analysis (all).csv".format(results_path, username), index=False)
+    df_tweets_original.to_csv("{}/{} - Tweet analysis (originals).csv".format(results_path, username), index=False)
+    df_mentions.to_csv("{}/{} - Tweet mentions count.csv".format(results_path, username), index=False)
+
+
+
+class TweetStore():
+    """
+    Per-user store of analyzed tweets, backed by the 'results/<username> - Tweet analysis (all).csv'
+    files, plus a JSON file recording the newest tweet id stored for each handle.
+    """
+    def __init__(self, results_path, state_filename=None):
+        self.results_path = results_path
+        self.state_filename = state_filename or os.path.join(results_path, 'sync_state.json')
+        self._latest_ids = dict()
+        if os.path.exists(self.state_filename):
+            with open(self.state_filename, 'r') as state_file:
+                self._latest_ids = json.load(state_file)
+
+
+    def tweets_filename(self, username):
+        return "{}/{} - Tweet analysis (all).csv".format(self.results_path, username)
+
+
+    def load(self, username):
+        """
+        Returns Pandas DataFrame of all stored tweets of 'username' (newest first), or None if there are none.
+        """
+        tweets_filename = self.tweets_filename(username)
+        if not os.path.exists(tweets_filename):
+            return None
+        return pd.read_csv(tweets_filename, parse_dates=['date'])
+
+
+    def load_tweets(self, usernames, columns=None, start=None, end=None, originals_only=False):
+        """
+        Reads stored tweets of several handles; same parameters and output as 'SQLiteTweetStore.load_tweets'
+        (except that 'usernames' is required, as there is no index of handles).
+        """
+        columns = list(columns or TWEET_COLUMNS)
+        if len(usernames) > 1 and 'handle' not in columns:
+            columns = ['handle'] + columns
+        needed_columns = [column for column in columns if column != 'handle']
+        if originals_only and 'tweets' not in needed_columns:
+            needed_columns.append('tweets')
+        if (start is not None or end is not None) and 'date' not in needed_columns:
+            needed_columns.append('date')
+
+        frames = list()
+        for username in usernames:
+            tweets_filename = self.tweets_filename(username)
+            if not os.path.exists(tweets_filename):
+                continue
+            df = pd.read_csv(tweets_filename, usecols=needed_columns)
+            if 'date' in df.columns:
+                df['date'] = pd.to_datetime(df['date'])
+            if originals_only:
+                df = df[~text_processing.is_retweet(df['tweets'])]
+            if start is not None:
+                df = df[df['date'] >= pd.Timestamp(start)]
+            if end is not None:
+                operator, bound = end_bound(end)
+                df = df[df['date'] < bound] if operator == '<' else df[df['date'] <= bound]
+            df.insert(0, 'handle', username)
+            frames.append(df)
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True).loc[:, columns]
+
+
+    def latest_id(self, username):
+        """
+        Returns id of the newest stored tweet of 'username', or None if nothing is stored yet.
+        """
+        if username not in self._latest_ids:
+            # Results written before syncing existed: recover the id from the CSV.
+            tweets_filename = self.tweets_filename(username)
+            if not os.path.exists(tweets_filename):
+                return None
+            ids = pd.read_csv(tweets_filename, usecols=['id'])['id']
+            if ids.empty:
+                return None
+            self._latest_ids[username] = int(ids.max())
+        return self._latest_ids[username]
+
+
+    def latest_ids(self, usernames):
+        """
+        Returns dictionary of username -> newest stored tweet id, for handles that have stored tweets.
+        """
+        latest_ids = {username: self.latest_id(username) for username in usernames}
+        return {username: tweet_id for username, tweet_id in latest_ids.items() if tweet_id is not None}
+
+
+    def merge(self, username, df_new):
+        """
+        Definition:
+            Adds newly fetched (and analyzed) tweets to the store of 'username', deduplicating on 'id'.
+
+        Parameters:
+            - username (string)
+            - df_new (Pandas DataFrame): Output of 'TweetAnalyzer.tweets_to_data_frame'.
+
+        Returns:
+            - Tuple of (df_all, df_added): every stored tweet (newest first), and only the rows
+              of 'df_new' that were not stored before.
+
+        """
+        df_stored = self.load(username)
+        if df_stored is None:
+            df_added = df_new.drop_duplicates(subset='id')
+            df_all = df_added
+        else:
+            df_added = df_new[~df_new['id'].isin(df_stored['id'])].drop_duplicates(subset='id')
+            df_all = pd.concat([df_added, df_stored], ignore_index=True, sort=False)
+        df_all = df_all.sort_values(by='id', ascending=False).reset_index(drop=True)
+
+        if not df_added.empty or df_stored is None:
+            df_all.to_csv(self.tweets_filename(username), index=False)
+        if not df_all.empty:
+            self._latest_ids[username] = int(df_all['id'].iloc[0])
+            self.save_state()
+        return df_all, df_added
+
+
+    def save_state(self):
+        temporary_filename = self.state_filename + '.tmp'
+        with open(temporary_filename, 'w') as state_file:
+            json.dump(self._latest_ids, state_file, indent=4, sort_keys=True)
+        os.replace(temporary_filename, self.state_filename)
+
+
+    def replace(self, username, df):
+        """
+        Overwrites the store of 'username' with 'df' (a full, non-incremental fetch).
+        """
+        df.to_csv(self.tweets_filename(username), index=False)
+        if not df.empty:
+            self._latest_ids[username] = int(df['id'].max())
+            self.save_state()
+
+
+
+class SQLiteTweetStore():
+    """
+    Indexed SQLite store of analyzed tweets for all handles, with the same interface as 'TweetStore'.
+    Original tweets and mention counts are derived at read time instead of being stored as extra copies.
+    """
+    def __init__(self, db_filename, batch_size=500, timeout=30):
+        self.db_filename = db_filename
+        self.batch_size = batch_size
+        # Usable from another thread than the creating one, as long as calls do not overlap.
+        self.connection = sqlite3.connect(db_filename, timeout=timeout, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS tweets (
+                handle TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                tweets TEXT,
+                len INTEGER,
+                date TEXT,
+                source TEXT,
+                likes INTEGER,
+                retweets INTEGER,
+                polarity REAL,
+                subjectivity REAL,
+                is_retweet INTEGER NOT NULL,
+                PRIMARY KEY (handle, id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_tweets_id ON tweets (id);
+            CREATE INDEX IF NOT EXISTS idx_tweets_date ON tweets (date);
+            CREATE INDEX IF NOT EXISTS idx_tweets_handle_date ON tweets (handle, date);
+        """)
+        self.connection.commit()
+
+
+    def close(self):
+        self.connection.close()
+
+
+    def is_empty(self):
+        return self.connection.execute("SELECT 1 FROM tweets LIMIT 1").fetchone() is None
+
+
+    def handles(self):
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT handle FROM tweets ORDER BY handle")]
+
+
+    def latest_id(self, username):
+        return self.connection.execute("SELECT MAX(id) FROM tweets WHERE handle = ?", (username,)).fetchone()[0]
+
+
+    def latest_ids(self, usernames):
+        latest_ids = {username: self.latest_id(username) for username in usernames}
+        return {username: tweet_id for username, tweet_id in latest_ids.items() if tweet_id is not None}
+
+
+    def _to_rows(self, username, df):
+        dates = pd.to_datetime(df['date']).dt.strftime(DATE_FORMAT)
+        is_retweet = text_processing.is_retweet(df['tweets'])
+        columns = zip(df['tweets'], df['id'], df['len'], dates, df['source'], df['likes'], df['retweets'],
+                      df['polarity'], df['subjectivity'], is_retweet)
+        return [
+            (username, int(tweet_id), tweet, int(length), date, source, int(likes), int(retweets),
+             float(polarity), float(subjectivity), int(retweet))
+            for tweet, tweet_id, length, date, source, likes, retweets, polarity, subjectivity, retweet in columns
+        ]
+
+
+    def _insert(self, username, df):
+        rows = self._to_rows(username, df)
+        with self.connection:
+            for start in range(0, len(rows), self.batch_size):
+                self.connection.executemany("""
+                    INSERT OR IGNORE INTO tweets
+                        (handle, id, tweets, len, date, source, likes, retweets, polarity, subjectivity, is_retweet)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows[start:start + self.batch_size])
+
+
+    def _stored_ids(self, username, ids):
+        ids = [int(tweet_id) for tweet_id in ids]
+        stored_ids = set()
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start:start + self.batch_size]
+            query = "SELECT id FROM tweets WHERE handle = ? AND id IN ({})".format(','.join('?' * len(batch)))
+            stored_ids.update(row[0] for row in self.connection.execute(query, [username] + batch))
+        return stored_ids
+
+
+    def merge(self, username, df_new):
+        """
+        Adds newly fetched (and analyzed) tweets of 'username', deduplicating on 'id'.
+        Returns tuple of (df_all, df_added), like 'TweetStore.merge'.
+        """
+        stored_ids = self._stored_ids(username, df_new['id'])
+        df_added = df_new[~df_new['id'].isin(stored_ids)].drop_duplicates(subset='id')
+        self._insert(username, df_added)
+        return self.load(username), df_added
+
+
+    def replace(self, username, df):
+        """
+        Overwrites all stored tweets of 'username' with 'df'.
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM tweets WHERE handle = ?", (username,))
+        self._insert(username, df.drop_duplicates(subset='id'))
+
+
+    def load_tweets(self, usernames=None, columns=None, start=None, end=None, originals_only=False):
+        """
+        Definition:
+            Reads stored tweets, fetching only the requested columns and date range.
+
+        Parameters:
+            - usernames (list of strings): Handles to read (None reads all handles).
+            - columns (list of strings): Subset of 'TWEET_COLUMNS' (None reads all of them).
+              A 'handle' column is added when reading several handles.
+            - start, end (string or datetime): Inclusive date range (None leaves that side open); an 'end'
+              without a time includes that whole day (see 'end_bound').
+            - originals_only (bool): Leave out retweets.
+
+        Returns:
+            - Pandas DataFrame, newest tweets first.
+
+        """
+        columns = list(columns or TWEET_COLUMNS)
+        unknown_columns = set(columns) - set(TWEET_COLUMNS) - {'handle'}
+        if unknown_columns:
+            raise ValueError("Unknown column(s): {}".format(sorted(unknown_columns)))
+        if (usernames is None or len(usernames) > 1) and 'handle' not in columns:
+            columns = ['handle'] + columns
+
+        conditions, params = list(), list()
+        if usernames is not None:
+            conditions.append("handle IN ({})".format(','.join('?' * len(usernames))))
+            params.extend(usernames)
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(pd.Timestamp(start).strftime(DATE_FORMAT))
+        if end is not None:
+            operator, bound = end_bound(end)
+            conditions.append("date {} ?".format(operator))
+            params.append(bound.strftime(DATE_FORMAT))
+        if originals_only:
+            conditions.append("is_retweet = 0")
+        query = "SELECT {} FROM tweets".format(', '.join(columns))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY handle, id DESC"
+
+        df = pd.read_sql_query(query, self.connection, params=params)
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date'])
+        return df
+
+
+    def load(self, username, originals_only=False):
+        """
+        Returns Pandas DataFrame of all stored tweets of 'username' (newest first), in the usual column layout.
+        """
+        return self.load_tweets([username], columns=TWEET_COLUMNS, originals_only=originals_only)
+
+
+    def load_mention_stats(self, username):
+        """
+        Returns mention counts of 'username', computed from the stored tweets.
+        """
+        return text_processing.count_mentions(self.load_tweets([username], columns=['tweets'])['tweets'])
+
+
+    def export_csv(self, username, results_path):
+        """
+        Writes the classic per-user CSV files for 'username' into 'results_path'.
+        """
+        df = self.load(username)
+        write_csv_results(results_path, username, df, df[~text_processing.is_retweet(df['tweets'])],
+                          text_processing.count_mentions(df['tweets']))
+
+
+    def import_csv_results(self, results_path):
+        """
+        Loads every 'results/<username> - Tweet analysis (all).csv' file into the store.
+        Returns list of imported usernames.
+        """
+        suffix = " - Tweet analysis (all).csv"
+        imported = list()
+        for csv_filename in sorted(glob.glob("{}/*{}".format(results_path, suffix))):
+            username = os.path.basename(csv_filename)[:-len(suffix)]
+            df = pd.read_csv(csv_filename, parse_dates=['date'])
+            self._insert(username, df.dropna(subset=['id']))
+            imported.append(username)
+        return imported
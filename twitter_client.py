@@ -0,0 +1,141 @@
+# Twitter API client, authentication and streaming (imports tweepy, and 'twitter_credentials' on use)
+from tweepy import API
+from tweepy import Cursor
+from tweepy.streaming import StreamListener
+from tweepy import OAuthHandler
+from tweepy import Stream
+from stream_writer import BufferedTweetWriter
+
+
+
+# Twitter client
+class TwitterClient():
+    def __init__(self, twitter_user=None):
+        self.auth = TwitterAuthenticator().authenticate_twitter_app()
+        self.twitter_client = API(self.auth)
+        self.twitter_user = twitter_user
+
+    def get_twitter_client_api(self):
+        return self.twitter_client
+
+    def get_user_timeline_tweets(self, num_tweets):
+        tweets = []
+        for tweet in Cursor(self.twitter_client.user_timeline, id=self.twitter_user).items(num_tweets):
+            tweets.append(tweet)
+        return tweets
+
+    def get_user_timeline_tweets_since(self, since_id, num_tweets):
+        """
+        Returns tweets of the user's timeline newer than 'since_id' (all of the latest tweets if None).
+        """
+        tweets = []
+        for tweet in Cursor(self.twitter_client.user_timeline, id=self.twitter_user, since_id=since_id).items(num_tweets):
+            tweets.append(tweet)
+        return tweets
+
+    def sync_user_timeline(self, tweet_store, tweet_analyzer, num_tweets):
+        """
+        Fetches only tweets newer than those already in 'tweet_store', analyzes them, and merges them into the store.
+        Returns tuple of (df_all, df_added) as returned by 'TweetStore.merge'.
+        """
+        tweets = self.get_user_timeline_tweets_since(tweet_store.latest_id(self.twitter_user), num_tweets)
+        df_new = tweet_analyzer.tweets_to_data_frame(tweets)
+        return tweet_store.merge(self.twitter_user, df_new)
+
+    def get_friend_list(self, num_friends):
+        friend_list = []
+        for friend in Cursor(self.twitter_client.friends, id=self.twitter_user).items(num_friends):
+            friend_list.append(friend)
+        return friend_list
+
+    def get_home_timeline_tweets(self, num_tweets):
+        home_timeline_tweets = []
+        for tweet in Cursor(self.twitter_client.home_timeline, id=self.twitter_user).items(num_tweets):
+            home_timeline_tweets.append(tweet)
+        return home_timeline_tweets
+
+
+
+# Twitter authenticator
+class TwitterAuthenticator():
+
+    def authenticate_twitter_app(self):
+        # Imported here, so the analysis code can be used (Eg: by 'benchmark.py') without credentials.
+        import twitter_credentials
+        auth = OAuthHandler(twitter_credentials.CONSUMER_KEY, twitter_credentials.CONSUMER_SECRET)
+        auth.set_access_token(twitter_credentials.ACCESS_TOKEN, twitter_credentials.ACCESS_TOKEN_SECRET)
+        return auth
+
+
+
+# Twitter Streamer
+class TwitterStreamer():
+    """
+    Class for streaming and processing live tweets.
+    """
+    def __init__(self):
+        self.twitter_autenticator = TwitterAuthenticator()
+
+    def stream_tweets(self, fetched_tweets_filename, hash_tag_list, writer=None, analytics=None):
+        # This handles Twitter authetification and the connection to Twitter Streaming API
+        # With 'analytics' (a 'RollingWindowAnalytics'), every tweet is also scored and aggregated on a background thread.
+        listener = TwitterListener(fetched_tweets_filename, writer=writer, analytics=analytics)
+        auth = self.twitter_autenticator.authenticate_twitter_app()
+        stream = Stream(auth, listener)
+
+        # This line filter Twitter Streams to capture data by the keywords: 
+        try:
+            stream.filter(track=hash_tag_list)
+        finally:
+            # Flushes buffered tweets on disconnect, errors and Ctrl+C alike.
+            listener.close()
+
+
+
+# Twitter stream listener
+class TwitterListener(StreamListener):
+    """
+    Listener that hands received tweets to a 'BufferedTweetWriter' (and to a 'LiveAnalyticsWorker' with 'analytics'),
+    and reports throughput every 'report_every' tweets (rather than printing on every tweet).
+    Neither blocks the stream: writing and analytics run on their own threads, and a failing writer does not stop analytics.
+    """
+    def __init__(self, fetched_tweets_filename, writer=None, report_every=1000, analytics=None):
+        self.fetched_tweets_filename = fetched_tweets_filename
+        self.writer = writer if writer is not None else BufferedTweetWriter(fetched_tweets_filename)
+        self.report_every = report_every
+        self.analytics = analytics
+        self.analytics_worker = None
+        if analytics is not None:
+            from live_analytics import LiveAnalyticsWorker
+            self.analytics_worker = LiveAnalyticsWorker(analytics)
+
+    def on_data(self, data):
+        if self.analytics_worker is not None:
+            self.analytics_worker.submit(data)
+        try:
+            self.writer.write(data)
+            if self.writer.received % self.report_every == 0:
+                print("Stream stats: {}".format(self.stats()))
+        except BaseException as e:
+            print("Error on_data %s" % str(e))
+        return True
+          
+    def on_error(self, status):
+        if status == 420:
+            # Returning False on_data method in case rate limit occurs.
+            return False
+        print(status)
+
+    def stats(self):
+        stats = self.writer.stats()
+        if self.analytics_worker is not None:
+            stats['analytics'] = self.analytics_worker.stats()
+        return stats
+
+    def close(self):
+        try:
+            self.writer.close()
+        finally:
+            if self.analytics_worker is not None:
+                self.analytics_worker.close()
+            print("Stream closed: {}".format(self.stats()))
@@ -26,4 +26,42 @@ usernames = [
     # 'sidlowe', 'honigstein', 'DeludedBrendan'
     ]
 
-number_of_tweets = 6000
\ No newline at end of file
+number_of_tweets = 6000
+
+# Number of processes used to score tweet sentiment (1 scores everything in the main process).
+sentiment_workers = 1
+
+# Number of handles whose timelines are fetched concurrently.
+fetch_workers = 4
+
+# Only fetch (and analyze) tweets newer than the ones already stored in the results folder.
+incremental_sync = True
+
+# Where analyzed tweets are stored: 'sqlite' (one indexed database) or 'csv' (per-user CSV files).
+results_backend = 'sqlite'
+
+# Also write the per-user CSV files (all tweets, original tweets, mention counts) when using the 'sqlite' backend.
+export_csv = False
+
+# Number of processes used to render charts and word clouds (1 renders in the main process).
+render_workers = 1
+
+# Also plot average sentiment per 'hour', 'day' or 'week' from the sentiment rollups (None disables).
+rollup_chart_granularity = None
+
+# Handles that may wait between two stages of the analysis pipeline before the earlier stage pauses.
+pipeline_queue_size = 2
+
+# Save a JSON report of wall time, CPU time, peak memory and items per stage and handle (None disables).
+run_report_filename = './results/run_report.json'
+
+# Also record peak memory per stage in the run report (traces every allocation, which slows the run down).
+trace_memory = False
+
+# Profile one stage of the pipeline ('fetch', 'score', 'aggregate', 'render' or 'persist'; None disables),
+# with 'cprofile' (every call, slower) or 'sampling' (stack samples, folded format for flame graphs).
+profile_stage = None
+profiler = 'cprofile'
+
+# Let 'sentiment_comparison.py' aggregate the tweets stored by 'tweet_analysis.py' instead of fetching them again.
+offline_comparison = True
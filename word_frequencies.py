@@ -0,0 +1,147 @@
+# Word frequency tables, for rendering word clouds without keeping the raw text around
+import json
+import re
+from collections import Counter
+from functools import lru_cache
+
+# Same token definition 'WordCloud' applies when generating from raw text.
+TOKEN_PATTERN = re.compile(r"\w[\w']+")
+# Minimum collocation score for a bigram to be shown as one phrase (default of 'WordCloud').
+COLLOCATION_THRESHOLD = 30
+
+
+
+@lru_cache(maxsize=None)
+def get_stop_words(language='english'):
+    """
+    Returns frozenset of stopwords from the 'nltk.corpus' module; loaded once per language.
+    """
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words(language))
+
+
+
+def _merge_plurals(counts):
+    """
+    Merges each word ending in 's' (but not 'ss') into its singular when both are counted, as 'WordCloud' does.
+    Returns tuple (dictionary of merged counts, dictionary of word -> the word it was counted as).
+    """
+    merged = dict(counts)
+    standard_forms = {word: word for word in counts}
+    for word in counts:
+        if word.endswith('s') and not word.endswith('ss') and word[:-1] in counts:
+            merged[word[:-1]] += merged.pop(word)
+            standard_forms[word] = word[:-1]
+    return merged, standard_forms
+
+
+
+class WordFrequencyTable():
+    """
+    Counts of (lowercased) words, and of pairs of adjacent words (bigrams), across many texts. Tables can be saved,
+    loaded and merged, so word clouds spanning several runs or users can be rendered from the counts alone,
+    with the same collocations and plural merging 'WordCloud' applies to raw text (see 'cloud_counts').
+    Bigrams are counted within each text, not across the end of one text and the start of the next.
+    """
+    def __init__(self, counts=None, bigram_counts=None):
+        self.counts = Counter(counts or dict())
+        self.bigram_counts = Counter(bigram_counts or dict())
+
+
+    def update(self, texts, stop_words=None):
+        """
+        Definition:
+            Tokenizes each text and adds its words, and its pairs of adjacent words, to the table, one text at a time.
+            As in 'WordCloud', pairs are formed before stop words are left out, and pairs with a stop word are skipped.
+
+        Parameters:
+            - texts (iterable of strings)
+            - stop_words (set of strings): Words to leave out (defaults to 'get_stop_words()').
+
+        Returns:
+            - The table itself.
+
+        """
+        if stop_words is None:
+            stop_words = get_stop_words()
+        for text in texts:
+            previous_word = None
+            for word in TOKEN_PATTERN.findall(str(text).lower()):
+                if word.endswith("'s"):
+                    word = word[:-2]
+                if not word or word.isdigit():
+                    continue
+                if word in stop_words:
+                    previous_word = None
+                    continue
+                self.counts[word] += 1
+                if previous_word is not None:
+                    self.bigram_counts[previous_word + ' ' + word] += 1
+                previous_word = word
+        return self
+
+
+    def merge(self, other):
+        """
+        Adds the counts of another 'WordFrequencyTable' to this one. Returns the table itself.
+        """
+        self.counts.update(other.counts)
+        self.bigram_counts.update(other.bigram_counts)
+        return self
+
+
+    def __add__(self, other):
+        return WordFrequencyTable(self.counts, self.bigram_counts).merge(other)
+
+
+    def __len__(self):
+        return len(self.counts)
+
+
+    def most_common(self, n=None):
+        return self.counts.most_common(n)
+
+
+    def cloud_counts(self, collocation_threshold=COLLOCATION_THRESHOLD):
+        """
+        Definition:
+            Returns the word counts 'WordCloud' would compute from the raw texts: plurals merged into their singular,
+            and bigrams that are collocations (Dunning likelihood ratio above 'collocation_threshold') shown as one
+            phrase, their count taken off each of their words.
+
+        Returns:
+            - Dictionary of word (or bigram) -> count, for 'WordCloud.generate_from_frequencies'.
+
+        """
+        from wordcloud.tokenization import score
+        counts, standard_forms = _merge_plurals(self.counts)
+        bigram_counts, _ = _merge_plurals(self.bigram_counts)
+        n_words = sum(self.counts.values())
+        # Collocation scores use the counts from before any bigram was taken off.
+        word_counts = dict(counts)
+        for bigram, count in bigram_counts.items():
+            word1, word2 = (standard_forms[word] for word in bigram.split(' '))
+            if score(count, word_counts[word1], word_counts[word2], n_words) > collocation_threshold:
+                counts[word1] -= count
+                counts[word2] -= count
+                counts[bigram] = count
+        return {word: count for word, count in counts.items() if count > 0}
+
+
+    def save(self, filename):
+        with open(filename, 'w') as frequencies_file:
+            json.dump({'words': dict(self.counts.most_common()), 'bigrams': dict(self.bigram_counts.most_common())},
+                      frequencies_file)
+
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads a table saved by 'save'. Returns None for a file of word counts only (saved before bigrams were
+        counted), as it cannot be merged into a table with bigrams; count the words again instead.
+        """
+        with open(filename, 'r') as frequencies_file:
+            data = json.load(frequencies_file)
+        if not isinstance(data.get('words'), dict):
+            return None
+        return cls(data['words'], data['bigrams'])